@@ -1,28 +1,109 @@
+import time
+import pandas as pd
 import streamlit as st
 from config.constants import *
 from utils.data_fetcher import DataFetcher
-from analysis.market_analyzer import MarketAnalyzer
+from utils.background_refresher import get_background_refresher, scan_key
+from utils.metrics import get_metrics
+from utils.shared_cache import get_shared_cache
 from components.ui import (
+    in_regions,
+    item_picker,
+    region_picker,
     display_market_prices,
     display_analysis_results,
     display_black_market_results,
+    display_scan_progress,
+    display_diagnostics,
 )
 
+PROGRESS_INTERVAL = 1.0  # Seconds between redraws of a scan in progress
 
-def initialize_session_state():
-    if "arbitrage_opportunities" not in st.session_state:
-        st.session_state.arbitrage_opportunities = None
-    if "black_market_opportunities" not in st.session_state:
-        st.session_state.black_market_opportunities = None
 
+def show_refresh_status(name: str):
+    """Caption with the age of the latest background scan, and its failures"""
+    refresher = get_background_refresher()
+    updated_at = refresher.updated_at(name)
+    if updated_at is not None:
+        minutes = int((time.time() - updated_at) // 60)
+        st.caption(f"Last updated {minutes} m ago, refreshed in the background.")
+    if refresher.error(name):
+        st.warning("The latest background refresh failed; showing older results.")
+    progress = refresher.last_partial(name)
+    if progress is not None and progress.failed:
+        st.warning(
+            f"{progress.failed} of {progress.total} batches of the latest scan "
+            "could not be fetched; their items are missing from the results."
+        )
+
+
+def latest_results(name: str, message: str, progress_title: str):
+    """
+    Latest result of a background scan. When there is none yet, wait for
+    the scan in progress and show its partial results as batches arrive;
+    every session waiting on the same scan shares that single run.
+    """
+    refresher = get_background_refresher()
+    results = refresher.latest(name)
+    if results is not None:
+        return results
+
+    runs = refresher.runs(name)
+    refresher.ensure_running(name)
+    placeholder = st.empty()
+    drawn, drawn_at = None, 0.0
+    with st.spinner(message):
+        while refresher.runs(name) == runs:
+            snapshot = refresher.partial(name)
+            if (
+                snapshot is not None
+                and snapshot is not drawn
+                and time.time() - drawn_at >= PROGRESS_INTERVAL
+            ):
+                with placeholder.container():
+                    display_scan_progress(snapshot, progress_title)
+                drawn, drawn_at = snapshot, time.time()
+            refresher.wait_for_update(timeout=PROGRESS_INTERVAL)
+    placeholder.empty()
+    return refresher.latest(name)
+
+
+def refresh_results(name: str):
+    """Drop a cached scan for every session and rerun it on freshly fetched prices"""
+    get_shared_cache().invalidate(scan_key(name))
+    get_background_refresher().refresh(name)
+
+
+def fetch_overview_prices(item_id: str, region: str = DEFAULT_REGION):
+    """Market Overview prices for an item in one region, shared across sessions"""
+    qualities = ",".join(str(quality) for quality in QUALITIES)
+    url = f"{BASE_URLS[region]}{item_id}.json?locations={','.join(CITIES)}&qualities={qualities}"
+    return get_shared_cache().get_or_compute(
+        ("prices", region, url),
+        lambda: DataFetcher.fetch_prices(url, region),
+        SHARED_CACHE_PRICES_TTL,
+    )
 
-def main():
-    # Initialize session state
-    initialize_session_state()
 
+def fetch_region_prices(item_id: str, regions: list) -> pd.DataFrame:
+    """Market Overview prices for an item in every region, fetched in parallel"""
+    prices = DataFetcher.for_regions(
+        lambda region: fetch_overview_prices(item_id, region), regions
+    )
+    frames = [df.assign(region=region) for region, df in prices.items() if not df.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def main():
     st.set_page_config(page_title="Albion Resource Prices", layout="wide")
     st.title("📦 Albion Online Resource Price Dashboard")
 
+    regions = region_picker(SCAN_REGIONS)
+
+    if st.sidebar.checkbox("🩺 Diagnostics"):
+        with st.sidebar:
+            display_diagnostics(get_metrics())
+
     # Display Tabs
     tabs = st.tabs(
         ["📊 Market Overview", "💸 Resource Arbitrage", "🏴‍☠️ Black Market Flips"]
@@ -31,48 +112,36 @@ def main():
     with tabs[0]:
         st.subheader("📈 Market Overview")
         # Item selector for market overview
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            resource = st.selectbox("Resource", RESOURCE_TYPES)
-        with col2:
-            tier = st.selectbox("Tier", TIERS)
-        with col3:
-            enchant = st.selectbox("Enchantment", ENCHANTMENTS)
-
-        item_id = DataFetcher.construct_item_id(resource, tier, enchant)
-        url = f"{BASE_URL}{item_id}.json?locations={','.join(CITIES)}&qualities=1"
-        df = DataFetcher.fetch_prices(url)
-        display_market_prices(df, item_id)
+        item_id = item_picker("market_overview")
+        if item_id:
+            df = fetch_region_prices(item_id, regions)
+            display_market_prices(df, item_id)
 
     with tabs[1]:
         st.subheader("💸 Resource Arbitrage Opportunities")
-        if st.session_state.arbitrage_opportunities is None:
-            with st.spinner("Running arbitrage analysis..."):
-                opportunities = MarketAnalyzer.run_market_analysis(
-                    "Arbitrage Opportunities"
-                )
-                st.session_state.arbitrage_opportunities = opportunities
-
-        display_analysis_results(st.session_state.arbitrage_opportunities)
         if st.button("🔄 Refresh Arbitrage Analysis"):
-            with st.spinner("Refreshing arbitrage analysis..."):
-                opportunities = MarketAnalyzer.run_market_analysis(
-                    "Arbitrage Opportunities"
-                )
-                st.session_state.arbitrage_opportunities = opportunities
+            refresh_results("arbitrage")
+
+        opportunities = latest_results(
+            "arbitrage",
+            "Running arbitrage analysis...",
+            "🏆 Top Opportunities So Far",
+        )
+        show_refresh_status("arbitrage")
+        display_analysis_results(in_regions(opportunities or [], regions))
 
     with tabs[2]:
         st.subheader("🏴‍☠️ Black Market Opportunities")
-        if st.session_state.black_market_opportunities is None:
-            with st.spinner("Running Black Market analysis..."):
-                opportunities = MarketAnalyzer.run_market_analysis("Black Market")
-                st.session_state.black_market_opportunities = opportunities
-
-        display_black_market_results(st.session_state.black_market_opportunities)
         if st.button("🔄 Refresh Black Market Analysis"):
-            with st.spinner("Refreshing Black Market analysis..."):
-                opportunities = MarketAnalyzer.run_market_analysis("Black Market")
-                st.session_state.black_market_opportunities = opportunities
+            refresh_results("black_market")
+
+        opportunities = latest_results(
+            "black_market",
+            "Running Black Market analysis...",
+            "🏴‍☠️ Top Black Market Flips So Far",
+        )
+        show_refresh_status("black_market")
+        display_black_market_results(in_regions(opportunities or [], regions))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,90 @@
+"""
+Headless entry point for running market scans from cron or a worker.
+
+Usage:
+    python -m albion scan --type black-market --out results.parquet
+    python -m albion scan --type arbitrage --out results.csv --prices-out prices.arrow
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from config.constants import DEFAULT_REGION, REGIONS
+
+TOP_RESULTS = 10  # Opportunities printed after a scan
+
+
+def scan(args: argparse.Namespace) -> int:
+    # Imported here so `--help` stays fast
+    import pandas as pd
+    from analysis.scan_runner import SCAN_TYPES, run_scan, write_frame
+
+    def report(done: int, total: int):
+        print(f"\rScanned {done} of {total} batches", end="", file=sys.stderr)
+
+    opportunities, failed = run_scan(
+        SCAN_TYPES[args.type],
+        processes=args.processes,
+        prices_out=args.prices_out,
+        progress_callback=None if args.quiet else report,
+        region=args.region,
+    )
+    if not args.quiet:
+        print(file=sys.stderr)
+
+    results = pd.DataFrame(opportunities)
+    write_frame(results, args.out)
+    print(f"Wrote {len(results):,} opportunities to {args.out}")
+    if args.prices_out:
+        print(f"Wrote price snapshot to {args.prices_out}")
+    if not results.empty and not args.quiet:
+        top = results.nlargest(TOP_RESULTS, "profit")
+        print(
+            top[["item_id", "quality", "buy_city", "sell_city", "profit"]].to_string(
+                index=False
+            )
+        )
+    if failed:
+        # The results were still written, without the failed batches
+        print(f"{failed} batches could not be fetched", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m albion", description="Albion market scanner"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan_parser = commands.add_parser("scan", help="Run a market scan")
+    scan_parser.add_argument(
+        "--type", choices=["arbitrage", "black-market"], default="black-market"
+    )
+    scan_parser.add_argument("--region", choices=list(REGIONS), default=DEFAULT_REGION)
+    scan_parser.add_argument(
+        "--out",
+        type=Path,
+        required=True,
+        help="Results file: .parquet, .arrow/.feather or .csv",
+    )
+    scan_parser.add_argument(
+        "--prices-out",
+        type=Path,
+        help="Also write the raw prices of the scan: .parquet or .arrow",
+    )
+    scan_parser.add_argument(
+        "--processes",
+        type=int,
+        help="Worker processes for the analysis (default: one per CPU)",
+    )
+    scan_parser.add_argument("--quiet", action="store_true")
+    scan_parser.set_defaults(func=scan)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,62 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+import numpy as np
 import pandas as pd
-import streamlit as st
-import requests
-import json
-from typing import Dict, List, Optional
+from typing import (
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+from analysis.opportunity_index import get_opportunity_index
+from utils.change_tracker import ChangeTracker
 from utils.data_fetcher import DataFetcher
-from config.constants import RESOURCE_TYPES, TIERS, ENCHANTMENTS, CITIES, BASE_URL
+from utils.item_catalog import get_item_catalog
+from utils.metrics import get_metrics
+from config.constants import (
+    RESOURCE_TYPES,
+    TIERS,
+    ENCHANTMENTS,
+    CITIES,
+    BASE_URLS,
+    DEFAULT_REGION,
+    QUALITIES,
+    SCAN_REGIONS,
+)
+
+TOP_K = 11  # Opportunities shown in the running top of a streaming scan
+# Metric label of each scan type
+SCAN_LABELS = {"Arbitrage Opportunities": "arbitrage", "Black Market": "black_market"}
+
+
+class ScanSnapshot(NamedTuple):
+    """Progress of a streaming scan"""
+
+    top: List[Dict]  # Most profitable opportunities known so far, best first
+    found: int  # Opportunities known so far, from this scan or the previous one
+    done: int  # Batches analyzed
+    total: int  # Batches expected
+    changed: int = 0  # Items whose prices changed since the previous scan
+    failed: int = 0  # Batches whose prices could not be fetched
+
+
+class ScanBatch(NamedTuple):
+    """One batch of price rows of a scan"""
+
+    done: int  # Batches fetched so far, this one included
+    total: int  # Batches expected
+    prices: pd.DataFrame  # Every row (city and quality) of the batch's items
+    changed: Set[str]  # Item ids whose rows need analyzing
+    failed: bool = False  # The batch's prices could not be fetched
 
 
 class MarketAnalyzer:
@@ -12,58 +64,373 @@ class MarketAnalyzer:
     SETUP_FEE = 0.025  # 2.5% setup fee
 
     @staticmethod
-    def find_opportunities(df: pd.DataFrame) -> Optional[Dict]:
-        if df.empty or len(df) < 2:
-            return None
-
-        df = df[df["sell_price_min"] > 0]
+    def find_all_opportunities(df: pd.DataFrame) -> List[Dict]:
+        """
+        Arbitrage opportunities of every item and quality in `df`, found
+        all at once. Picks the cheapest and dearest city per (item, quality)
+        with a single groupby and applies the tax and setup fee column-wise.
+        """
         if df.empty:
-            return None
-
-        best_buy = df.sort_values("sell_price_min").head(1)
-        best_sell = df.sort_values("sell_price_min", ascending=False).head(1)
-
-        if best_buy.empty or best_sell.empty:
-            return None
+            return []
 
-        buy_price = best_buy.iloc[0]["sell_price_min"]
-        sell_price = best_sell.iloc[0]["sell_price_min"]
+        df = df[df["sell_price_min"] > 0].reset_index(drop=True)
+        if df.empty:
+            return []
 
-        if buy_price == 0 or sell_price == 0 or sell_price <= buy_price:
-            return None
+        prices = df["sell_price_min"].groupby(
+            [df["item_id"], df["quality"]], sort=False, observed=True
+        )
+        best_buy = df.loc[prices.idxmin().to_numpy()].reset_index(drop=True)
+        best_sell = df.loc[prices.idxmax().to_numpy()].reset_index(drop=True)
+
+        buy_price = best_buy["sell_price_min"]
+        sell_price = best_sell["sell_price_min"]
+        profit = (
+            sell_price
+            - buy_price
+            - sell_price * MarketAnalyzer.TAX_RATE
+            - buy_price * MarketAnalyzer.SETUP_FEE
+        )
+
+        result = pd.DataFrame(
+            {
+                "buy_city": best_buy["city"],
+                "buy_price": buy_price,
+                "buy_price_date": best_buy["sell_price_min_date"],
+                "sell_city": best_sell["city"],
+                "sell_price": sell_price,
+                "sell_price_date": best_sell["sell_price_min_date"],
+                "profit": profit,
+                "item_id": best_buy["item_id"],
+                "quality": best_buy["quality"],
+            }
+        )
+        return result[sell_price > buy_price].to_dict("records")
 
-        # Calculate profit before fees
-        profit = sell_price - buy_price
+    @staticmethod
+    def find_black_market_opportunities(df: pd.DataFrame) -> List[Dict]:
+        """
+        Compare the Black Market buy orders of every item and quality with
+        the cheapest sell order in the other cities in a single columnar
+        pass. A Black Market order also takes items of a higher quality, so
+        it is matched with the cheapest offer at its quality or above.
+        """
+        if df.empty:
+            return []
 
-        # Apply tax and setup fee
-        tax_amount = sell_price * MarketAnalyzer.TAX_RATE
-        setup_fee_amount = buy_price * MarketAnalyzer.SETUP_FEE
-        profit -= tax_amount + setup_fee_amount
+        df = df.reset_index(drop=True)
+        is_black_market = df["city"] == "Black Market"
+        black_market = df.loc[
+            is_black_market & (df["buy_price_max"] > 0),
+            ["item_id", "quality", "buy_price_max", "buy_price_max_date"],
+        ].drop_duplicates(["item_id", "quality"])
+        other_cities = df[~is_black_market & (df["sell_price_min"] > 0)]
+        if black_market.empty or other_cities.empty:
+            return []
 
-        return {
-            "buy_city": best_buy.iloc[0]["city"],
-            "buy_price": buy_price,
-            "buy_price_date": best_buy.iloc[0]["sell_price_min_date"],
-            "sell_city": best_sell.iloc[0]["city"],
-            "sell_price": sell_price,
-            "sell_price_date": best_sell.iloc[0]["sell_price_min_date"],
-            "profit": profit,
-        }
+        # Cheapest sell order per item and quality outside the Black Market
+        cheapest = (
+            other_cities["sell_price_min"]
+            .groupby(
+                [other_cities["item_id"], other_cities["quality"]],
+                sort=False,
+                observed=True,
+            )
+            .idxmin()
+        )
+        offers = (
+            df.loc[
+                cheapest.to_numpy(),
+                ["item_id", "quality", "city", "sell_price_min", "buy_price_min_date"],
+            ]
+            .sort_values(["item_id", "quality"], ascending=[True, False])
+            .reset_index(drop=True)
+        )
+
+        # Walking each item from the highest quality down, the best offer
+        # at a quality or above is the latest row matching the running
+        # minimum. An item's first row always matches, so positions never
+        # carry over from the previous item.
+        running_min = offers.groupby("item_id", sort=False, observed=True)[
+            "sell_price_min"
+        ].cummin()
+        is_best = (offers["sell_price_min"] == running_min).to_numpy()
+        source = np.maximum.accumulate(np.where(is_best, np.arange(len(offers)), 0))
+        best = offers.iloc[source].reset_index(drop=True)
+        best["buy_quality"] = best["quality"]
+        best["quality"] = offers["quality"].to_numpy()
+
+        # Each order takes the nearest quality at or above its own with an offer
+        merged = pd.merge_asof(
+            black_market.sort_values("quality"),
+            best.sort_values("quality"),
+            on="quality",
+            by="item_id",
+            direction="forward",
+        )
+        merged = merged[merged["buy_price_max"] > merged["sell_price_min"]].astype(
+            {
+                "sell_price_min": df["sell_price_min"].dtype,
+                "buy_quality": df["quality"].dtype,
+            }
+        )
+
+        result = pd.DataFrame(
+            {
+                "item_id": merged["item_id"],
+                "quality": merged["quality"],
+                "buy_quality": merged["buy_quality"],
+                "buy_city": merged["city"],
+                "buy_price": merged["sell_price_min"],
+                "buy_price_date": merged["buy_price_min_date"],
+                "sell_city": "Black Market",
+                "sell_price": merged["buy_price_max"],
+                "sell_price_date": merged["buy_price_max_date"],
+                "profit": merged["buy_price_max"] - merged["sell_price_min"],
+            }
+        )
+        return result.sort_values("profit", ascending=False).to_dict("records")
 
     @staticmethod
     def run_market_analysis(
         analysis_type: str = "Arbitrage Opportunities",
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        regions: Sequence[str] = SCAN_REGIONS,
     ) -> List[Dict]:
+        """
+        Run a full market scan of `regions` in parallel. Progress is shown
+        with st.progress unless a `progress_callback(done, total)` is given,
+        which lets the scan run outside the Streamlit script thread.
+        """
+        if analysis_type == "Price Comparison":
+            print("Price Comparison analysis is not implemented yet.")
+            return []
+        if analysis_type not in SCAN_LABELS:
+            return []
+        report_progress = MarketAnalyzer._progress_reporter(progress_callback)
+        stream = MarketAnalyzer.stream_region_analysis(analysis_type, regions)
+        while True:
+            try:
+                snapshot = next(stream)
+            except StopIteration as stop:
+                return stop.value
+            report_progress(snapshot.done, snapshot.total)
+
+    @staticmethod
+    def stream_market_analysis(
+        analysis_type: str = "Arbitrage Opportunities",
+        top_k: int = TOP_K,
+        region: str = DEFAULT_REGION,
+        max_age: Optional[float] = None,
+    ) -> Generator[ScanSnapshot, None, List[Dict]]:
+        """
+        Run a market scan of one region batch by batch. Only the items whose
+        rows changed since the previous scan of the same type and region
+        are analyzed; the others keep their opportunity in the
+        OpportunityIndex. A ScanSnapshot with the top `top_k` opportunities
+        is yielded after each batch, and the full list, most profitable
+        first and each tagged with its "region", is the generator's return
+        value. Cached prices older than `max_age` seconds are fetched again.
+        """
+        if analysis_type not in SCAN_LABELS:
+            return []
+        label = SCAN_LABELS[analysis_type]
+        index = get_opportunity_index(label, region)
+        batches = MarketAnalyzer.scan_batches(
+            analysis_type, index.tracker, region, max_age
+        )
+        analyze = MarketAnalyzer.analyzer(analysis_type)
+
+        metrics = get_metrics()
+        started = time.perf_counter()
+        seen: Set[str] = set()
+        changed = failed = 0
+        completed = False
+        try:
+            for batch in batches:
+                df = batch.prices
+                if not df.empty:
+                    seen.update(df["item_id"].unique())
+                if batch.changed:
+                    df = df[df["item_id"].isin(batch.changed)]
+                    with metrics.timer("albion_analysis_seconds", analysis=label):
+                        found = analyze(df)
+                    metrics.inc("albion_analysis_rows_total", len(df), analysis=label)
+                    for opportunity in found:
+                        opportunity["region"] = region
+                    index.update(batch.changed, found)
+                changed += len(batch.changed)
+                failed += batch.failed
+                yield ScanSnapshot(
+                    index.top(top_k),
+                    len(index),
+                    batch.done,
+                    batch.total,
+                    changed,
+                    failed,
+                )
+            completed = True
+        finally:
+            if not completed:
+                # Items diffed but never analyzed would otherwise be skipped
+                # by the next scan
+                index.tracker.forget()
+
+        # Items missing from this scan, e.g. from a failed batch, are dropped
+        index.retain(seen)
+        opportunities = index.top()
+        MarketAnalyzer.finish_scan(analysis_type, opportunities)
+        metrics.observe(
+            "albion_scan_seconds",
+            time.perf_counter() - started,
+            analysis=label,
+            region=region,
+        )
+        return opportunities
+
+    @staticmethod
+    def stream_region_analysis(
+        analysis_type: str = "Arbitrage Opportunities",
+        regions: Sequence[str] = SCAN_REGIONS,
+        top_k: int = TOP_K,
+        max_age: Optional[float] = None,
+    ) -> Generator[ScanSnapshot, None, List[Dict]]:
+        """
+        Run stream_market_analysis for every region at once, each on its own
+        thread. Regions have their own rate limiter and connection pool, so
+        the scan takes about as long as the slowest region. Each snapshot
+        combines the latest progress of every region, and the return value
+        holds the opportunities of all regions side by side, most
+        profitable first.
+        """
+        if analysis_type not in SCAN_LABELS:
+            return []
+        updates = queue.Queue()
+
+        def scan(region: str):
+            # Each region reports its snapshots, then its result or error
+            try:
+                stream = MarketAnalyzer.stream_market_analysis(
+                    analysis_type, top_k, region, max_age
+                )
+                while True:
+                    try:
+                        updates.put((region, next(stream)))
+                    except StopIteration as stop:
+                        updates.put((region, stop.value))
+                        return
+            except Exception as error:
+                updates.put((region, error))
+
+        # Profiled along with the calling thread when it is being profiled
+        scan = get_metrics().profiled(scan)
+        threads = [
+            threading.Thread(
+                target=scan, args=(region,), name=f"scan-{region}", daemon=True
+            )
+            for region in regions
+        ]
+        for thread in threads:
+            thread.start()
+
+        snapshots: Dict[str, ScanSnapshot] = {}
+        results: Dict[str, List[Dict]] = {}
+        while len(results) < len(regions):
+            region, update = updates.get()
+            if isinstance(update, Exception):
+                raise update
+            if not isinstance(update, ScanSnapshot):
+                results[region] = update
+                continue
+            snapshots[region] = update
+            latest = snapshots.values()
+            yield ScanSnapshot(
+                heapq.nlargest(
+                    top_k,
+                    itertools.chain.from_iterable(s.top for s in latest),
+                    key=lambda opp: opp["profit"],
+                ),
+                sum(s.found for s in latest),
+                sum(s.done for s in latest),
+                sum(s.total for s in latest),
+                sum(s.changed for s in latest),
+                sum(s.failed for s in latest),
+            )
+
+        for thread in threads:
+            thread.join()
+        opportunities = [opp for region in regions for opp in results[region]]
+        opportunities.sort(key=lambda opp: opp["profit"], reverse=True)
+        return opportunities
+
+    @staticmethod
+    def scan_batches(
+        analysis_type: str,
+        tracker: Optional[ChangeTracker] = None,
+        region: str = DEFAULT_REGION,
+        max_age: Optional[float] = None,
+    ) -> Iterator[ScanBatch]:
+        """
+        Yield each batch of a scan of `region` along with the ids of the
+        items whose rows changed since `tracker` last saw them, or of all
+        its items without a tracker. Every batch holds all cities and
+        qualities of its items, so batches can be analyzed independently,
+        in any order and in any process. Batches whose prices could not be
+        fetched are yielded empty and marked `failed`. Cached prices older than `max_age`
+        seconds are fetched again.
+        """
+        if analysis_type == "Arbitrage Opportunities":
+            batches = MarketAnalyzer._arbitrage_batches(region, max_age)
+        else:
+            batches = MarketAnalyzer._black_market_batches(region, max_age)
+        label = SCAN_LABELS[analysis_type]
+        metrics = get_metrics()
+        for done, total, df in batches:
+            if df is None:
+                yield ScanBatch(done, total, pd.DataFrame(), set(), failed=True)
+                continue
+            if tracker is None:
+                changed = set(df["item_id"].unique()) if not df.empty else set()
+            else:
+                changed = tracker.diff(df)
+                metrics.inc("albion_changed_items_total", len(changed), analysis=label)
+            yield ScanBatch(done, total, df, changed)
+
+    @staticmethod
+    def analyzer(analysis_type: str) -> Callable[[pd.DataFrame], List[Dict]]:
+        """Function finding the opportunities of a scan in one batch"""
         if analysis_type == "Arbitrage Opportunities":
-            return MarketAnalyzer._run_arbitrage_analysis()
-        elif analysis_type == "Black Market":
-            return MarketAnalyzer._run_black_market_analysis()
-        elif analysis_type == "Price Comparison":
-            return st.error("Price Comparison analysis is not implemented yet.")
-        return []
+            return MarketAnalyzer.find_all_opportunities
+        return MarketAnalyzer.find_black_market_opportunities
+
+    @staticmethod
+    def finish_scan(analysis_type: str, opportunities: List[Dict]):
+        """Final ordering of the opportunities of a whole scan, in place"""
+        if analysis_type == "Black Market":
+            if not opportunities:
+                print("No data available from the market")
+            opportunities.sort(key=lambda x: x["profit"], reverse=True)
 
     @staticmethod
-    def _run_arbitrage_analysis() -> List[Dict]:
+    def _progress_reporter(
+        progress_callback: Optional[Callable[[int, int], None]],
+    ) -> Callable[[int, int], None]:
+        if progress_callback is not None:
+            return progress_callback
+        # Only scans run from a Streamlit script get a progress bar
+        import streamlit as st
+
+        progress_bar = st.progress(0)
+        return lambda done, total: progress_bar.progress(done / max(total, 1))
+
+    @staticmethod
+    def _arbitrage_batches(
+        region: str = DEFAULT_REGION, max_age: Optional[float] = None
+    ) -> Iterator[Tuple[int, int, Optional[pd.DataFrame]]]:
+        """
+        Yield (done, total, prices) for each batch of resource items, with
+        None prices for a batch that could not be fetched
+        """
         all_item_ids = [
             DataFetcher.construct_item_id(res, t, e)
             for res in RESOURCE_TYPES
@@ -72,99 +439,41 @@ class MarketAnalyzer:
         ]
         with open("all_item_ids.txt", "w") as file:
             file.write("\n".join(all_item_ids))
-        opportunities = []
-        progress_bar = st.progress(0)
         total_batches = (len(all_item_ids) + 49) // 50  # Round up division
+        qualities = ",".join(str(quality) for quality in QUALITIES)
 
         for batch_num, i in enumerate(range(0, len(all_item_ids), 50)):
             batch_ids = all_item_ids[i : i + 50]
-            url = f"{BASE_URL}{','.join(batch_ids)}.json?locations={','.join(CITIES)}&qualities=1"
-
-            response = requests.get(url)
-            if response.status_code != 200:
-                continue
-
-            df_all = pd.DataFrame(response.json())
-            df_all = df_all[df_all["sell_price_min"] > 0]
-
-            for item in df_all["item_id"].unique():
-                subset = df_all[df_all["item_id"] == item]
-                opportunity = MarketAnalyzer.find_opportunities(subset)
-                if opportunity:
-                    opportunity["item_id"] = item
-                    opportunities.append(opportunity)
-
-            progress_bar.progress((batch_num + 1) / total_batches)
-
-        return opportunities
+            url = f"{BASE_URLS[region]}{','.join(batch_ids)}.json?locations={','.join(CITIES)}&qualities={qualities}"
+            yield batch_num + 1, total_batches, DataFetcher.fetch_raw_prices(
+                url, region, max_age
+            )
 
     @staticmethod
-    def _run_black_market_analysis() -> List[Dict]:
-        # Load items from JSON
+    def _black_market_batches(
+        region: str = DEFAULT_REGION, max_age: Optional[float] = None
+    ) -> Iterator[Tuple[int, int, Optional[pd.DataFrame]]]:
+        """
+        Yield (done, total, prices) for each batch of catalog items, with
+        None prices for a batch that could not be fetched
+        """
+        # Load items from the compiled catalog
         try:
-            with open("config/items_cleaned.json", "r", encoding="utf-8") as f:
-                items_data = json.load(f)
-        except FileNotFoundError:
-            st.error(
+            catalog = get_item_catalog()
+        except FileNotFoundError as e:
+            raise FileNotFoundError(
                 "Items database not found. Please ensure items_cleaned.json exists."
-            )
-            return []
+            ) from e
 
-        opportunities = []
-        progress_bar = st.progress(0)
+        progress = {"done": 0, "total": 1}
 
-        # Get unique item names
-        unique_items = [item["UniqueName"] for item in items_data]
-
-        # Initialize DataFetcher
-        data_fetcher = DataFetcher()
-
-        with st.spinner("Fetching Black Market data in batches..."):
-            # Fetch all data using bulk prices
-            df_all = data_fetcher.fetch_bulk_prices(unique_items)
-
-            if df_all.empty:
-                st.warning("No data available from the market")
-                return []
-
-            # Process each item
-            total_items = len(df_all["item_id"].unique())
-            for idx, item in enumerate(df_all["item_id"].unique()):
-                item_df = df_all[df_all["item_id"] == item]
-
-                # Get Black Market data
-                bm_data = item_df[item_df["city"] == "Black Market"]
-                other_cities = item_df[item_df["city"] != "Black Market"]
-
-                if not bm_data.empty and not other_cities.empty:
-                    # Black Market buy price (what they pay)
-                    bm_buy_price = bm_data.iloc[0]["buy_price_max"]
-
-                    # Find best sell price in other cities
-                    best_sell = other_cities.sort_values("sell_price_min").head(1)
-                    market_price = best_sell.iloc[0]["sell_price_min"]
-
-                    # Calculate profit
-                    if bm_buy_price > market_price and market_price > 0:
-                        opportunities.append(
-                            {
-                                "item_id": item,
-                                "buy_city": best_sell.iloc[0]["city"],
-                                "buy_price": market_price,
-                                "buy_price_date": best_sell.iloc[0][
-                                    "buy_price_min_date"
-                                ],
-                                "sell_city": "Black Market",
-                                "sell_price": bm_buy_price,
-                                "sell_price_date": bm_data.iloc[0][
-                                    "buy_price_max_date"
-                                ],
-                                "profit": bm_buy_price - market_price,
-                            }
-                        )
-
-                progress_bar.progress((idx + 1) / total_items)
-
-        # Sort opportunities by profit
-        opportunities.sort(key=lambda x: x["profit"], reverse=True)
-        return opportunities
+        def track(done: int, total: int):
+            progress.update(done=done, total=total)
+
+        # Every batch holds all cities and qualities of its items, so it can
+        # be analyzed alone
+        for _, columns in DataFetcher(region).iter_bulk_prices(
+            catalog.ids(), progress_callback=track, max_age=max_age
+        ):
+            prices = columns.to_frame() if columns is not None else None
+            yield progress["done"], progress["total"], prices
@@ -0,0 +1,95 @@
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config.constants import DEFAULT_REGION
+from utils.change_tracker import ChangeTracker
+
+
+class OpportunityIndex:
+    """
+    The current opportunities of every item and quality for one scan type,
+    kept sorted by profit across scans.
+
+    `tracker` remembers the rows each item's opportunity was computed from,
+    so a scan only needs to recompute the items it reports as changed and
+    `update` them here, all qualities at once. The sorted order is
+    maintained by removing and inserting single entries, so a refresh
+    touching a few items costs about that many bisections rather than a
+    full sort.
+    """
+
+    def __init__(self):
+        self.tracker = ChangeTracker()
+        self._lock = threading.Lock()
+        # item_id -> quality -> opportunity
+        self._by_item: Dict[str, Dict[int, Dict]] = {}
+        # (-profit, item_id, quality) in ascending order, i.e. most
+        # profitable first
+        self._keys: List[Tuple[float, str, int]] = []
+
+    def _remove(self, item_id: str):
+        for quality, opportunity in self._by_item.pop(item_id, {}).items():
+            key = (-opportunity["profit"], item_id, quality)
+            del self._keys[bisect_left(self._keys, key)]
+
+    def update(self, item_ids: Iterable[str], opportunities: List[Dict]):
+        """
+        Replace the opportunities of `item_ids`, at every quality, with the
+        ones found for them; those items without one in `opportunities`
+        are removed
+        """
+        found: Dict[str, Dict[int, Dict]] = {}
+        for opportunity in opportunities:
+            quality = int(opportunity["quality"])
+            found.setdefault(opportunity["item_id"], {})[quality] = opportunity
+        with self._lock:
+            for item_id in set(item_ids) | found.keys():
+                self._remove(item_id)
+                by_quality = found.get(item_id)
+                if by_quality:
+                    self._by_item[item_id] = by_quality
+                    for quality, opportunity in by_quality.items():
+                        insort(self._keys, (-opportunity["profit"], item_id, quality))
+
+    def retain(self, item_ids: Set[str]):
+        """Drop the opportunities of every item not in `item_ids`"""
+        with self._lock:
+            dropped = self._by_item.keys() - item_ids
+            for item_id in dropped:
+                self._remove(item_id)
+        # Recompute them if they come back, even with the same rows
+        self.tracker.forget(dropped)
+
+    def top(self, k: Optional[int] = None) -> List[Dict]:
+        """The `k` most profitable opportunities (all by default), best first"""
+        with self._lock:
+            return [
+                self._by_item[item_id][quality]
+                for _, item_id, quality in self._keys[:k]
+            ]
+
+    def clear(self):
+        """Forget everything, so the next scan recomputes every item"""
+        with self._lock:
+            self._by_item.clear()
+            self._keys.clear()
+            self.tracker.forget()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+_indexes: Dict[Tuple[str, str], OpportunityIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_opportunity_index(name: str, region: str = DEFAULT_REGION) -> OpportunityIndex:
+    """
+    Return the opportunity index of one scan type in one region, shared by
+    the process
+    """
+    with _indexes_lock:
+        if (name, region) not in _indexes:
+            _indexes[name, region] = OpportunityIndex()
+        return _indexes[name, region]
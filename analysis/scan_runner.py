@@ -0,0 +1,179 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Union
+
+import pandas as pd
+
+from analysis.market_analyzer import SCAN_LABELS, MarketAnalyzer
+from config.constants import DEFAULT_REGION
+from utils.metrics import get_metrics
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Only needed for Parquet and Arrow output
+    pa = pq = None
+
+# CLI name -> MarketAnalyzer analysis type
+SCAN_TYPES = {"arbitrage": "Arbitrage Opportunities", "black-market": "Black Market"}
+ARROW_SUFFIXES = (".arrow", ".feather", ".ipc")
+
+
+class ScanResult(NamedTuple):
+    """Outcome of a headless scan"""
+
+    opportunities: List[Dict]  # Most profitable first
+    failed: int  # Batches whose prices could not be fetched and are missing
+
+
+def _require_pyarrow(path: Path):
+    if path.suffix != ".csv" and pa is None:
+        raise RuntimeError(f"Writing {path} needs pyarrow: pip install pyarrow")
+
+
+def write_frame(df: pd.DataFrame, path: Union[str, Path]):
+    """Write `df` as Parquet, Arrow IPC or CSV depending on the file suffix"""
+    path = Path(path)
+    _require_pyarrow(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix in ARROW_SUFFIXES:
+        df.reset_index(drop=True).to_feather(path)
+    elif path.suffix == ".csv":
+        df.to_csv(path, index=False)
+    else:
+        df.to_parquet(path, index=False)
+
+
+class PriceSnapshotWriter:
+    """
+    Append the raw price batches of a scan to one Parquet or Arrow IPC file
+    as they arrive, so the whole snapshot is never held in memory
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        scanned_at: pd.Timestamp,
+        region: str = DEFAULT_REGION,
+    ):
+        self.path = Path(path)
+        _require_pyarrow(self.path)
+        if self.path.suffix == ".csv":
+            raise ValueError("Price snapshots are written as Parquet or Arrow")
+        self.scanned_at = scanned_at
+        self.region = region
+        self.rows = 0
+        self._schema = None
+        self._writer = None
+
+    def write(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        # Category dictionaries differ between batches; plain strings don't
+        categories = df.select_dtypes("category").columns
+        df = df.astype({column: str for column in categories})
+        df = df.assign(region=self.region, scanned_at=self.scanned_at)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._schema = table.schema
+            if self.path.suffix in ARROW_SUFFIXES:
+                self._writer = pa.ipc.new_file(str(self.path), self._schema)
+            else:
+                self._writer = pq.ParquetWriter(str(self.path), self._schema)
+        self._writer.write_table(table.cast(self._schema))
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self) -> "PriceSnapshotWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_scan(
+    analysis_type: str,
+    processes: Optional[int] = None,
+    prices_out: Optional[Union[str, Path]] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    region: str = DEFAULT_REGION,
+) -> ScanResult:
+    """
+    Run a full market scan of one region without Streamlit.
+
+    Batches are fetched in this process, so they share one DataFetcher,
+    rate limiter and price cache, and each batch is analyzed on a pool of
+    `processes` worker processes (one per CPU by default). At most twice
+    as many batches as workers wait for analysis at any time. Results are
+    merged in batch order, like MarketAnalyzer.run_market_analysis. Raw
+    price batches are appended to `prices_out` when given. Opportunities
+    are returned most profitable first. Batches that
+    could not be fetched are counted in the result's `failed`.
+    """
+    if analysis_type not in SCAN_LABELS:
+        raise ValueError(f"Unknown analysis type: {analysis_type}")
+    analyze = MarketAnalyzer.analyzer(analysis_type)
+    label = SCAN_LABELS[analysis_type]
+    processes = max(1, processes or os.cpu_count() or 1)
+    metrics = get_metrics()
+    started = time.perf_counter()
+    scanned_at = pd.Timestamp.now(tz="UTC").tz_localize(None)
+
+    results: Dict[int, List[Dict]] = {}
+    failed = 0
+    writer = PriceSnapshotWriter(prices_out, scanned_at, region) if prices_out else None
+    # Workers are spawned rather than forked: forking while the fetch
+    # threads hold locks could deadlock the children
+    context = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(processes, mp_context=context) as pool:
+            pending = {}
+
+            def collect(finished):
+                for future in finished:
+                    results[pending.pop(future)] = future.result()
+
+            for idx, batch in enumerate(
+                MarketAnalyzer.scan_batches(analysis_type, region=region)
+            ):
+                done, total, df = batch.done, batch.total, batch.prices
+                failed += batch.failed
+                del batch
+                if writer is not None:
+                    writer.write(df)
+                metrics.inc("albion_analysis_rows_total", len(df), analysis=label)
+                if not df.empty:
+                    pending[pool.submit(analyze, df)] = idx
+                del df
+                if len(pending) >= 2 * processes:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                if progress_callback:
+                    progress_callback(done, total)
+            collect(wait(pending)[0])
+    finally:
+        if writer is not None:
+            writer.close()
+
+    opportunities = [
+        {**opp, "region": region} for idx in sorted(results) for opp in results[idx]
+    ]
+    MarketAnalyzer.finish_scan(analysis_type, opportunities)
+    # finish_scan only orders Black Market flips; the written results are
+    # ranked for every scan type
+    opportunities.sort(key=lambda x: x["profit"], reverse=True)
+    metrics.observe(
+        "albion_scan_seconds",
+        time.perf_counter() - started,
+        analysis=label,
+        region=region,
+    )
+    return ScanResult(opportunities, failed)
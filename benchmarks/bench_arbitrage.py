@@ -0,0 +1,127 @@
+"""
+Compare the per-item arbitrage loop with MarketAnalyzer.find_all_opportunities.
+
+Usage:
+    python benchmarks/bench_arbitrage.py --items 10000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Add the project root directory to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from analysis.market_analyzer import MarketAnalyzer
+from config.constants import CITIES
+
+
+def make_prices(n_items: int, seed: int = 0) -> pd.DataFrame:
+    """Build a synthetic price frame with one row per item and city"""
+    rng = np.random.default_rng(seed)
+    n_rows = n_items * len(CITIES)
+    prices = rng.integers(100, 100_000, n_rows)
+    # Roughly a fifth of the orders are missing, like in real scans
+    prices[rng.random(n_rows) < 0.2] = 0
+    return pd.DataFrame(
+        {
+            "item_id": np.repeat([f"T4_ITEM_{i}" for i in range(n_items)], len(CITIES)),
+            "city": np.tile(CITIES, n_items),
+            "quality": 1,
+            "sell_price_min": prices,
+            "sell_price_min_date": "2024-01-01T00:00:00",
+        }
+    )
+
+
+def find_opportunities(df: pd.DataFrame) -> Optional[Dict]:
+    """The original arbitrage check for the rows of a single item"""
+    if df.empty or len(df) < 2:
+        return None
+
+    df = df[df["sell_price_min"] > 0]
+    if df.empty:
+        return None
+
+    best_buy = df.sort_values("sell_price_min").head(1)
+    best_sell = df.sort_values("sell_price_min", ascending=False).head(1)
+
+    if best_buy.empty or best_sell.empty:
+        return None
+
+    buy_price = best_buy.iloc[0]["sell_price_min"]
+    sell_price = best_sell.iloc[0]["sell_price_min"]
+
+    if buy_price == 0 or sell_price == 0 or sell_price <= buy_price:
+        return None
+
+    # Calculate profit before fees
+    profit = sell_price - buy_price
+
+    # Apply tax and setup fee
+    tax_amount = sell_price * MarketAnalyzer.TAX_RATE
+    setup_fee_amount = buy_price * MarketAnalyzer.SETUP_FEE
+    profit -= tax_amount + setup_fee_amount
+
+    return {
+        "buy_city": best_buy.iloc[0]["city"],
+        "buy_price": buy_price,
+        "buy_price_date": best_buy.iloc[0]["sell_price_min_date"],
+        "sell_city": best_sell.iloc[0]["city"],
+        "sell_price": sell_price,
+        "sell_price_date": best_sell.iloc[0]["sell_price_min_date"],
+        "profit": profit,
+    }
+
+
+def run_loop(df: pd.DataFrame) -> list:
+    """The original per-item implementation"""
+    df = df[df["sell_price_min"] > 0]
+    opportunities = []
+    for item in df["item_id"].unique():
+        opportunity = find_opportunities(df[df["item_id"] == item])
+        if opportunity:
+            opportunity["item_id"] = item
+            opportunities.append(opportunity)
+    return opportunities
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=10_000)
+    args = parser.parse_args()
+
+    df = make_prices(args.items)
+
+    start = time.perf_counter()
+    vectorized = MarketAnalyzer.find_all_opportunities(df)
+    vectorized_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    looped = run_loop(df)
+    loop_time = time.perf_counter() - start
+
+    key = lambda opp: opp["item_id"]
+    same = [
+        (o["item_id"], o["buy_price"], o["sell_price"], round(o["profit"], 6))
+        for o in sorted(looped, key=key)
+    ] == [
+        (o["item_id"], o["buy_price"], o["sell_price"], round(o["profit"], 6))
+        for o in sorted(vectorized, key=key)
+    ]
+
+    print(f"Items:          {args.items:,} ({len(df):,} rows)")
+    print(f"Opportunities:  {len(vectorized):,} (results match: {same})")
+    print(f"Per-item loop:  {loop_time:.3f} s")
+    print(f"Vectorized:     {vectorized_time:.3f} s")
+    print(f"Speedup:        {loop_time / vectorized_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+Time the scan pipelines end to end and stage by stage against a local
+stand-in for the Albion Data API, and write the results as JSON.
+
+Synthetic price rows (or recorded ones, with --fixtures) are served by
+utils.mock_api.FixtureServer. The price cache, history store and rate
+limiter are swapped for throwaway instances so runs are repeatable and
+never touch local data.
+
+Usage:
+    python benchmarks/bench_pipelines.py --sizes 1000 10000 50000 --out bench.json
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+# Add the project root directory to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from utils.mock_api import FixtureServer
+
+DEFAULT_SIZES = [1_000, 10_000, 50_000]
+PAGE_ROWS = 100  # Rows styled per table page
+
+
+def make_rows(
+    item_ids: List[str], cities: List[str], qualities: List[int], seed: int = 0
+) -> List[Dict]:
+    """
+    Synthetic prices endpoint rows, one per item, city and quality, so the
+    price cache counts every item as fully cached
+    """
+    rng = np.random.default_rng(seed)
+    n = len(item_ids) * len(cities) * len(qualities)
+    sell = rng.integers(100, 100_000, n)
+    buy = rng.integers(100, 150_000, n)
+    # Roughly a fifth of the orders are missing, like in real scans
+    sell[rng.random(n) < 0.2] = 0
+    ages = rng.integers(0, 48 * 3600, n)
+    now = np.datetime64("now", "s")
+    dates = np.datetime_as_string(now - ages.astype("timedelta64[s]"), unit="s")
+    rows = []
+    for i, (item_id, city, quality) in enumerate(
+        (item_id, city, quality)
+        for item_id in item_ids
+        for city in cities
+        for quality in qualities
+    ):
+        date = str(dates[i])
+        rows.append(
+            {
+                "item_id": item_id,
+                "city": city,
+                "quality": quality,
+                "sell_price_min": int(sell[i]),
+                "sell_price_min_date": date if sell[i] else "0001-01-01T00:00:00",
+                "sell_price_max": int(sell[i]),
+                "sell_price_max_date": date if sell[i] else "0001-01-01T00:00:00",
+                "buy_price_min": int(buy[i]),
+                "buy_price_min_date": date,
+                "buy_price_max": int(buy[i]),
+                "buy_price_max_date": date,
+            }
+        )
+    return rows
+
+
+def timed(fn: Callable, repeat: int) -> Dict:
+    """Best and median wall time of `fn` over `repeat` runs"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {"best": min(times), "median": float(np.median(times)), "repeat": repeat}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=project_root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+@contextlib.contextmanager
+def working_directory(path: str):
+    # The arbitrage scan writes all_item_ids.txt to the working directory
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def isolate(workdir: Path):
+    """Swap process-wide caches and the limiters for throwaway instances"""
+    import utils.data_fetcher as data_fetcher
+    import utils.price_cache as price_cache
+    import utils.rate_limiter as rate_limiter
+    from config.constants import REGIONS
+
+    price_cache._shared_cache = price_cache.PriceCache(workdir / "prices.sqlite3")
+    for region in REGIONS:
+        rate_limiter._shared_limiters[region] = rate_limiter.RateLimiter(10**9, 10**9)
+    data_fetcher.HISTORY_ENABLED = False
+
+
+def run(sizes: List[int], repeat: int, fixtures: Path = None) -> Dict:
+    server = FixtureServer.from_directory(fixtures) if fixtures else FixtureServer()
+    recorded = server.fixtures["prices"]
+    os.environ["ALBION_API_HOST"] = server.start()
+
+    from analysis.market_analyzer import SCAN_LABELS, MarketAnalyzer
+    import analysis.market_analyzer as market_analyzer
+    from analysis.opportunity_index import get_opportunity_index
+    from components import ui
+    from components.freshness import add_age_columns, style_ages
+    from config.constants import (
+        CITIES,
+        DEFAULT_REGION,
+        ENCHANTMENTS,
+        QUALITIES,
+        RESOURCE_TYPES,
+        TIERS,
+    )
+    from utils.change_tracker import get_conditional_cache
+    from utils.data_fetcher import DataFetcher
+    from utils.metrics import get_metrics
+    from utils.price_parser import decode_price_columns
+    import utils.price_cache as price_cache
+
+    # Streamlit calls made outside `streamlit run` only log warnings
+    logging.disable(logging.WARNING)
+
+    results = []
+
+    def record(benchmark: str, rows: int, fn: Callable, **extra):
+        timing = timed(fn, repeat)
+        results.append({"benchmark": benchmark, "rows": rows, **timing, **extra})
+        print(f"{benchmark:<32} {rows:>8,} rows  {timing['best'] * 1000:10.1f} ms")
+
+    def requests_made(fn: Callable) -> int:
+        """API requests sent by one run of `fn`"""
+        total = lambda: sum(
+            row["total"]
+            for row in get_metrics().summary()
+            if row["metric"] == "albion_requests_total"
+        )
+        before = total()
+        fn()
+        return int(total() - before)
+
+    with tempfile.TemporaryDirectory() as tmp, working_directory(tmp):
+        workdir = Path(tmp)
+        isolate(workdir)
+        # Scans of the default region only, without any state from earlier runs
+        cold = lambda fn: lambda: (
+            price_cache.get_price_cache().clear(),
+            get_conditional_cache().clear(),
+            [get_opportunity_index(label).clear() for label in SCAN_LABELS.values()],
+            fn(),
+        )
+
+        # Resource arbitrage scans a fixed set of items
+        resource_ids = [
+            DataFetcher.construct_item_id(res, t, e)
+            for res in RESOURCE_TYPES
+            for t in TIERS
+            for e in ENCHANTMENTS
+        ]
+        if not fixtures:
+            server.fixtures["prices"] = make_rows(resource_ids, CITIES, QUALITIES)
+        record(
+            "run_arbitrage_analysis",
+            len(resource_ids) * len(CITIES) * len(QUALITIES),
+            cold(
+                lambda: MarketAnalyzer.run_market_analysis(
+                    "Arbitrage Opportunities",
+                    progress_callback=lambda d, t: None,
+                    regions=[DEFAULT_REGION],
+                )
+            ),
+        )
+
+        for size in sizes:
+            if fixtures:
+                rows = recorded[:size]
+                item_ids = list(dict.fromkeys(row["item_id"] for row in rows))
+            else:
+                # Whole items only, so sizes round up to a multiple of the
+                # rows of one item
+                rows_per_item = len(CITIES) * len(QUALITIES)
+                item_ids = [
+                    f"T4_BENCH_ITEM_{i}" for i in range(-(-size // rows_per_item))
+                ]
+                rows = make_rows(item_ids, CITIES, QUALITIES)
+                size = len(rows)
+                server.fixtures["prices"] = rows
+            payload = json.dumps(rows).encode("utf-8")
+            fetcher = DataFetcher()
+
+            record(
+                "create_batched_url",
+                size,
+                lambda: fetcher.batch_processor.create_batched_url(item_ids, CITIES),
+                urls=len(fetcher.batch_processor.create_batched_url(item_ids, CITIES)),
+            )
+            record("decode_price_columns", size, lambda: decode_price_columns(payload))
+            columns = decode_price_columns(payload)
+            record("to_frame", size, columns.to_frame)
+            df = columns.to_frame()
+            record(
+                "find_all_opportunities",
+                size,
+                lambda: MarketAnalyzer.find_all_opportunities(df),
+            )
+            record(
+                "find_black_market_opportunities",
+                size,
+                lambda: MarketAnalyzer.find_black_market_opportunities(df),
+            )
+            fetch_cold = cold(lambda: fetcher.fetch_bulk_prices(item_ids))
+            fetch_cached = lambda: fetcher.fetch_bulk_prices(item_ids)
+            record(
+                "fetch_bulk_prices",
+                size,
+                fetch_cold,
+                requests=requests_made(fetch_cold),
+            )
+            record(
+                "fetch_bulk_prices_cached",
+                size,
+                fetch_cached,
+                requests=requests_made(fetch_cached),
+            )
+
+            class Catalog:
+                def ids(self):
+                    return item_ids
+
+            market_analyzer.get_item_catalog = lambda: Catalog()
+            record(
+                "run_black_market_analysis",
+                size,
+                cold(
+                    lambda: MarketAnalyzer.run_market_analysis(
+                        "Black Market",
+                        progress_callback=lambda d, t: None,
+                        regions=[DEFAULT_REGION],
+                    )
+                ),
+            )
+
+            # Rendering helpers: one opportunity per row
+            opportunities = (
+                df.assign(
+                    profit=df["buy_price_max"] - df["sell_price_min"],
+                    sell_city="Black Market",
+                )
+                .rename(
+                    columns={
+                        "city": "buy_city",
+                        "sell_price_min": "buy_price",
+                        "sell_price_min_date": "buy_price_date",
+                        "buy_price_max": "sell_price",
+                        "buy_price_max_date": "sell_price_date",
+                    }
+                )[
+                    [
+                        "item_id",
+                        "profit",
+                        "buy_city",
+                        "buy_price",
+                        "buy_price_date",
+                        "sell_city",
+                        "sell_price",
+                        "sell_price_date",
+                    ]
+                ]
+                .astype({"item_id": str, "buy_city": str})
+                .to_dict("records")
+            )
+            frame = df.assign(profit=df["buy_price_max"] - df["sell_price_min"])
+            record(
+                "add_age_columns",
+                size,
+                lambda: add_age_columns(frame, {"sell_price_min_date": "sell_updated"}),
+            )
+            aged, styles = add_age_columns(
+                frame, {"sell_price_min_date": "sell_updated"}
+            )
+            # The tables only style the visible page
+            page = aged.head(PAGE_ROWS)
+            record(
+                "style_ages_page",
+                size,
+                lambda: style_ages(
+                    page, {k: v[:PAGE_ROWS] for k, v in styles.items()}
+                ).to_html(),
+            )
+            record(
+                "display_black_market_results",
+                size,
+                lambda: ui.display_black_market_results(opportunities),
+            )
+
+    server.stop()
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--fixtures", type=Path, help="Directory with recorded prices.json"
+    )
+    parser.add_argument("--out", type=Path, help="Write the results to this file")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.repeat, args.fixtures)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(text, encoding="utf-8")
+        print(f"Wrote {args.out}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Tuple
+
+# Age buckets: (upper bound in hours, CSS style); older data is red
+FRESHNESS_BUCKETS = [
+    (7, "color: #00FF00"),  # Green
+    (16, "color: #FFA500"),  # Orange
+]
+STALE_STYLE = "color: #FF0000"  # Red
+UNKNOWN = "N/A"
+
+
+def hours_ago(values, now: Optional[pd.Timestamp] = None) -> np.ndarray:
+    """
+    Age in hours of a whole column of timestamps against a single `now`.
+    Accepts datetimes or strings; naive values are taken as UTC. Missing
+    or unparseable values give NaN.
+    """
+    timestamps = pd.to_datetime(pd.Series(values), errors="coerce", utc=True)
+    now = pd.Timestamp.now(tz="UTC") if now is None else now
+    return ((now - timestamps) / pd.Timedelta(hours=1)).to_numpy(dtype=float)
+
+
+def format_ages(hours: np.ndarray) -> np.ndarray:
+    """Readable ages: "12 m ago" under an hour, "3.5 h ago" otherwise"""
+    hours = np.asarray(hours, dtype=float)
+    known = ~np.isnan(hours)
+    minutes = np.where(known, hours * 60, 0).astype(np.int64)
+    tenths = np.round(np.where(known, hours, 0), 1)
+    labels = np.where(
+        hours < 1,
+        np.char.add(minutes.astype(str), " m ago"),
+        np.char.add(np.char.mod("%.1f", tenths), " h ago"),
+    ).astype(object)
+    labels[~known] = UNKNOWN
+    return labels
+
+
+def age_styles(hours: np.ndarray) -> np.ndarray:
+    """CSS colour for each age, bucketed numerically; "" where unknown"""
+    hours = np.asarray(hours, dtype=float)
+    bounds = [bound for bound, _ in FRESHNESS_BUCKETS]
+    styles = np.array([style for _, style in FRESHNESS_BUCKETS] + [STALE_STYLE, ""])
+    bucket = np.searchsorted(bounds, hours, side="left")
+    bucket[np.isnan(hours)] = len(styles) - 1
+    return styles[bucket]
+
+
+def add_age_columns(
+    df: pd.DataFrame, columns: Dict[str, str], now: Optional[pd.Timestamp] = None
+) -> Tuple[pd.DataFrame, Dict[str, np.ndarray]]:
+    """
+    Add a readable age column for each timestamp column, all measured
+    against the same `now`. `columns` maps timestamp columns to age column
+    names. Returns the new frame and the styles of each age column.
+    """
+    now = pd.Timestamp.now(tz="UTC") if now is None else now
+    df = df.copy()
+    styles = {}
+    for timestamp_column, age_column in columns.items():
+        hours = hours_ago(df[timestamp_column], now)
+        df[age_column] = format_ages(hours)
+        styles[age_column] = age_styles(hours)
+    return df, styles
+
+
+def style_ages(
+    df: pd.DataFrame, styles: Dict[str, np.ndarray]
+) -> "pd.io.formats.style.Styler":
+    """Colour the age columns of `df` from precomputed styles in one pass"""
+    css = pd.DataFrame(
+        {column: styles[column] for column in styles if column in df.columns},
+        index=df.index,
+    )
+    return df.style.apply(lambda _: css, axis=None, subset=list(css.columns))
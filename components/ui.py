@@ -1,54 +1,77 @@
+import heapq
 import streamlit as st
 import pandas as pd
-from typing import Dict, List
-from datetime import datetime, timezone
-
-
-def get_hours_ago(timestamp_str: str) -> float:
-    """Convert timestamp to hours ago and return hours as float"""
-    try:
-        # Parse timestamp with error handling
-        if not timestamp_str or pd.isna(timestamp_str):
-            return 0.0
-
-        # Parse timestamp and ensure it's UTC aware
-        timestamp = pd.to_datetime(timestamp_str, errors="coerce", utc=True)
-        if pd.isna(timestamp):
-            return 0.0
-
-        # Get current time in UTC
-        now = pd.to_datetime(datetime.now(timezone.utc))
-        delta = now - timestamp
-        return delta.total_seconds() / 3600
-    except Exception:
-        return 0.0
-
-
-def style_time_cell(time_str: str) -> str:
-    """Return CSS style based on how old the data is"""
-    # Handle minute cases
-    if "m ago" in time_str:
-        return "color: #00FF00"  # Green for all minute-based times
-
-    # Handle hour cases
-    try:
-        hours = float(time_str.split("h")[0])
-        if hours <= 7:
-            return "color: #00FF00"  # Green
-        elif hours <= 16:
-            return "color: #FFA500"  # Orange
-        else:
-            return "color: #FF0000"  # Red
-    except:
-        return ""
-
-
-def format_time_ago(hours: float) -> str:
-    """Format hours into a readable string"""
-    if hours < 1:
-        minutes = int(hours * 60)
-        return f"{minutes} m ago"
-    return f"{hours:.1f} h ago"
+from typing import Dict, List, Optional
+from components.freshness import add_age_columns, style_ages
+from config.constants import QUALITY_NAMES, REGION_NAMES
+from utils.item_search import find_matches, resource_item_ids
+
+ITEM_PICKER_RESULTS = 25  # Matches offered by the item picker
+TOP_OPPORTUNITIES = 11  # Opportunity cards shown above the tables
+PAGE_SIZES = [25, 50, 100, 250]
+SORT_COLUMNS = {
+    "Profit": "profit",
+    "Buy Price": "buy_price",
+    "Sell Price": "sell_price",
+    "Item": "item_id",
+}
+OPPORTUNITY_COLUMNS = [
+    "item_id",
+    "quality",
+    "buy_quality",  # Black Market flips only
+    "region",
+    "profit",
+    "buy_city",
+    "buy_price",
+    "buy_updated",
+    "sell_city",
+    "sell_price",
+    "sell_updated",
+]
+
+
+def item_picker(key: str = "item_picker") -> Optional[str]:
+    """Type-ahead item selector over every item name and id"""
+    query = st.text_input(
+        "Search items",
+        key=f"{key}_query",
+        placeholder="Item name or id, e.g. Elder's Bloodletter or T4_ORE",
+    )
+    if query:
+        matches = find_matches(query, limit=ITEM_PICKER_RESULTS)
+        if not matches:
+            st.info(f"No items match '{query}'.")
+            return None
+        options = {match["item_id"]: match["name"] for match in matches}
+    else:
+        options = {item_id: item_id for item_id in resource_item_ids()}
+
+    return st.selectbox(
+        "Item",
+        list(options),
+        format_func=lambda item_id: (
+            f"{options[item_id]} ({item_id})"
+            if options[item_id] and options[item_id] != item_id
+            else item_id
+        ),
+        key=f"{key}_select",
+    )
+
+
+def region_picker(regions: List[str], key: str = "regions") -> List[str]:
+    """Sidebar selection of the regions whose markets are shown"""
+    return st.sidebar.multiselect(
+        "🌍 Regions",
+        regions,
+        default=regions,
+        format_func=lambda region: REGION_NAMES.get(region, region),
+        key=key,
+    )
+
+
+def in_regions(opportunities: List[Dict], regions: List[str]) -> List[Dict]:
+    """The opportunities found in `regions`"""
+    return [opp for opp in opportunities if opp.get("region") in regions]
 
 
 def display_market_prices(df: pd.DataFrame, item_id: str):
@@ -57,23 +80,12 @@ def display_market_prices(df: pd.DataFrame, item_id: str):
         st.warning("No market data available.")
         return
 
-    # Create a copy to avoid modifying the original dataframe
-    display_df = df.copy()
-
-    # Find all timestamp columns
+    # Replace each timestamp column with its age, computed column-wise
     timestamp_columns = [col for col in df.columns if col.endswith("_date")]
-
-    # Process each timestamp column
-    for col in timestamp_columns:
-        base_name = col.replace("_date", "")
-        # Calculate hours ago for each timestamp
-        display_df[f"{base_name}_age"] = df[col].apply(get_hours_ago)
-        # Format the display string
-        display_df[f"{base_name}_updated"] = display_df[f"{base_name}_age"].apply(
-            format_time_ago
-        )
-        # Drop original and intermediate columns
-        display_df = display_df.drop(columns=[col, f"{base_name}_age"])
+    display_df, age_styles = add_age_columns(
+        df, {col: col.replace("_date", "_updated") for col in timestamp_columns}
+    )
+    display_df = display_df.drop(columns=timestamp_columns)
 
     # Reorder columns
     price_columns = [
@@ -83,13 +95,17 @@ def display_market_prices(df: pd.DataFrame, item_id: str):
         "buy_price_max",
     ]
     update_columns = [col for col in display_df.columns if col.endswith("_updated")]
-    columns_order = ["city"] + price_columns + update_columns
+    if "region" in display_df.columns:
+        display_df["region"] = display_df["region"].map(REGION_NAMES)
+    columns_order = ["region", "city", "quality"] + price_columns + update_columns
     columns_order = [col for col in columns_order if col in display_df.columns]
     display_df = display_df[columns_order]
 
     # Rename columns
     column_mapping = {
+        "region": "Region",
         "city": "City",
+        "quality": "Quality",
         "sell_price_min": "Min Sell",
         "sell_price_max": "Max Sell",
         "buy_price_min": "Min Buy",
@@ -102,16 +118,9 @@ def display_market_prices(df: pd.DataFrame, item_id: str):
     display_df = display_df.rename(columns=column_mapping)
 
     # Create a styled dataframe
-    styled_df = display_df.style.apply(
-        lambda x: [
-            (
-                style_time_cell(val)
-                if isinstance(val, str) and ("m ago" in val or "h ago" in val)
-                else ""
-            )
-            for val in x
-        ],
-        axis=0,
+    styled_df = style_ages(
+        display_df,
+        {column_mapping.get(col, col): styles for col, styles in age_styles.items()},
     )
 
     # Display the styled dataframe
@@ -121,7 +130,8 @@ def display_market_prices(df: pd.DataFrame, item_id: str):
         column_config={
             col: st.column_config.NumberColumn(col, format="%d")
             for col in display_df.columns
-            if any(
+            if col not in ("Region", "Quality")
+            and any(
                 price_type in col.lower()
                 for price_type in ["sell", "buy", "min", "max"]
             )
@@ -131,78 +141,164 @@ def display_market_prices(df: pd.DataFrame, item_id: str):
     )
 
 
-def display_analysis_results(opportunities: List[Dict]):
-    if not opportunities:
-        st.info("No profitable opportunities found.")
-        return
+def top_opportunities(
+    opportunities: List[Dict], k: int = TOP_OPPORTUNITIES
+) -> List[Dict]:
+    """The k most profitable opportunities, without sorting the whole list"""
+    return heapq.nlargest(k, opportunities, key=lambda x: x["profit"])
 
-    # Sort opportunities by profit
-    sorted_opportunities = sorted(
-        opportunities, key=lambda x: x["profit"], reverse=True
-    )
 
-    # Display top 11 most profitable opportunities in a 3x4 grid
-    st.subheader("🏆 Top 10 Most Profitable Opportunities")
+def display_top_opportunities(opportunities: List[Dict], title: str):
+    st.subheader(title)
 
     # Split opportunities into rows of 3
-    for i in range(0, min(11, len(sorted_opportunities)), 3):
+    top = top_opportunities(opportunities)
+    for i in range(0, len(top), 3):
         cols = st.columns(3)
-        row_opportunities = sorted_opportunities[i : min(i + 3, 11)]
-        for col, opp in zip(cols, row_opportunities):
+        for col, opp in zip(cols, top[i : i + 3]):
             with col:
                 display_opportunity_card(opp["item_id"], opp)
 
-    # Display full table of opportunities
-    st.subheader("📊 All Market Opportunities")
-    df_opportunities = pd.DataFrame(sorted_opportunities)
 
-    # Add last updated columns
-    df_opportunities["buy_updated"] = df_opportunities["buy_price_date"].apply(
-        lambda x: format_time_ago(get_hours_ago(x)) if x else "N/A"
+def display_scan_progress(snapshot, title: str):
+    """
+    Partial results of a scan still in progress. Renders no widgets, so it
+    can be redrawn into the same placeholder as batches arrive.
+    """
+    failed = f"{snapshot.failed} failed, " if snapshot.failed else ""
+    st.progress(
+        snapshot.done / max(snapshot.total, 1),
+        text=f"Scanned {snapshot.done} of {snapshot.total} batches, {failed}"
+        f"{snapshot.changed:,} items changed, "
+        f"{snapshot.found:,} opportunities so far",
     )
-    df_opportunities["sell_updated"] = df_opportunities["sell_price_date"].apply(
-        lambda x: format_time_ago(get_hours_ago(x)) if x else "N/A"
+    if snapshot.failed:
+        st.warning(
+            f"{snapshot.failed} batches could not be fetched; their items will "
+            "be missing from the results."
+        )
+    if snapshot.top:
+        display_top_opportunities(snapshot.top, title)
+
+
+def filter_opportunities(
+    df: pd.DataFrame,
+    cities: Optional[List[str]] = None,
+    item_query: str = "",
+    min_profit: float = 0,
+) -> pd.DataFrame:
+    """Opportunities buying or selling in `cities`, matching an item substring"""
+    mask = df["profit"] >= min_profit
+    if cities:
+        mask &= df["buy_city"].isin(cities) | df["sell_city"].isin(cities)
+    if item_query:
+        mask &= df["item_id"].str.contains(item_query, case=False, regex=False)
+    return df[mask]
+
+
+def page_opportunities(
+    df: pd.DataFrame, sort_by: str, page: int, page_size: int
+) -> pd.DataFrame:
+    """
+    One page of opportunities sorted by `sort_by` (descending, except item
+    ids). Only the rows up to the end of the page are ordered.
+    """
+    end = page * page_size
+    if sort_by == "item_id":
+        ordered = df.sort_values(sort_by, kind="stable").head(end)
+    else:
+        ordered = df.nlargest(end, sort_by)
+    return ordered.iloc[end - page_size :]
+
+
+def opportunity_page(opportunities: List[Dict], key: str) -> pd.DataFrame:
+    """Filter, sort and page opportunities with controls; returns the visible rows"""
+    df = pd.DataFrame(opportunities)
+    cities = sorted(set(df["buy_city"]) | set(df["sell_city"]))
+
+    filter_cols = st.columns([2, 2, 1, 1])
+    selected_cities = filter_cols[0].multiselect("City", cities, key=f"{key}_cities")
+    item_query = filter_cols[1].text_input("Item contains", key=f"{key}_item")
+    min_profit = filter_cols[2].number_input(
+        "Min profit", min_value=0, value=0, step=1000, key=f"{key}_min_profit"
+    )
+    sort_label = filter_cols[3].selectbox(
+        "Sort by", list(SORT_COLUMNS), key=f"{key}_sort"
+    )
+    df = filter_opportunities(df, selected_cities, item_query, min_profit)
+
+    page_cols = st.columns([1, 1, 4])
+    page_size = page_cols[0].selectbox("Rows per page", PAGE_SIZES, key=f"{key}_size")
+    pages = max(1, -(-len(df) // page_size))
+    # Filtering may leave fewer pages than the page currently selected
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = page_cols[1].number_input(
+        "Page", min_value=1, max_value=pages, key=f"{key}_page"
     )
+    page_cols[2].caption(f"{len(df):,} opportunities, page {page} of {pages}")
 
-    # Reorder columns for better presentation
-    columns = [
-        "item_id",
-        "profit",
-        "buy_city",
-        "buy_price",
-        "buy_updated",
-        "sell_city",
-        "sell_price",
-        "sell_updated",
-    ]
-    df_opportunities = df_opportunities[columns]
+    return page_opportunities(df, SORT_COLUMNS[sort_label], int(page), page_size)
 
-    # Format numeric columns
-    df_opportunities["profit"] = df_opportunities["profit"].map("{:,.0f}".format)
-    df_opportunities["buy_price"] = df_opportunities["buy_price"].map("{:,.0f}".format)
-    df_opportunities["sell_price"] = df_opportunities["sell_price"].map(
-        "{:,.0f}".format
-    )
 
-    # Create styled dataframe
-    styled_df = df_opportunities.style.apply(
-        lambda x: [
-            (
-                style_time_cell(val)
-                if isinstance(val, str) and ("m ago" in val or "h ago" in val)
-                else ""
-            )
-            for val in x
-        ],
-        axis=0,
-    )
+def display_opportunity_table(
+    opportunities: List[Dict], key: str, column_config: Dict, number_format=None
+):
+    """Paged opportunity table; only the visible page is formatted and sent"""
+    df_page = opportunity_page(opportunities, key)
+    if df_page.empty:
+        st.info("No opportunities match the filters.")
+        return
+
+    # Add last updated columns
+    age_columns = {
+        col: updated
+        for col, updated in (
+            ("buy_price_date", "buy_updated"),
+            ("sell_price_date", "sell_updated"),
+        )
+        if col in df_page.columns
+    }
+    df_page, age_styles = add_age_columns(df_page, age_columns)
+    df_page = df_page[[col for col in OPPORTUNITY_COLUMNS if col in df_page.columns]]
+    for col, names in (
+        ("quality", QUALITY_NAMES),
+        ("buy_quality", QUALITY_NAMES),
+        ("region", REGION_NAMES),
+    ):
+        if col in df_page.columns:
+            df_page[col] = df_page[col].map(names)
+
+    # Format numeric columns
+    if number_format:
+        for col in ("profit", "buy_price", "sell_price"):
+            df_page[col] = df_page[col].map(number_format.format)
 
-    # Display the styled dataframe
     st.dataframe(
-        styled_df,
+        style_ages(df_page, age_styles),
         use_container_width=True,
+        column_config=column_config,
+        hide_index=True,
+    )
+
+
+def display_analysis_results(opportunities: List[Dict]):
+    if not opportunities:
+        st.info("No profitable opportunities found.")
+        return
+
+    # Display top 11 most profitable opportunities in a 3x4 grid
+    display_top_opportunities(opportunities, "🏆 Top 10 Most Profitable Opportunities")
+
+    # Display full table of opportunities
+    st.subheader("📊 All Market Opportunities")
+    display_opportunity_table(
+        opportunities,
+        key="arbitrage",
         column_config={
             "item_id": "Item",
+            "quality": "Quality",
+            "region": "Region",
             "profit": "Profit (Silver)",
             "buy_city": "Buy Location",
             "buy_price": "Buy Price",
@@ -211,20 +307,31 @@ def display_analysis_results(opportunities: List[Dict]):
             "sell_price": "Sell Price",
             "sell_updated": "Sell Updated",
         },
-        hide_index=True,
+        number_format="{:,.0f}",
     )
 
 
 def display_opportunity_card(item_id: str, data: Dict):
+    quality = data.get("quality", 1)
+    buy_quality = data.get("buy_quality", quality)
+    # Only mention the bought quality when it differs from the order's
+    substitute = f" ({QUALITY_NAMES[buy_quality]})" if buy_quality != quality else ""
     col1, col2 = st.columns([1, 4])
     with col1:
-        st.image(f"https://render.albiononline.com/v1/item/{item_id}.png", width=60)
+        st.image(
+            f"https://render.albiononline.com/v1/item/{item_id}.png?quality={quality}",
+            width=60,
+        )
     with col2:
-        st.markdown(f"**{item_id}**")
+        region = REGION_NAMES.get(data.get("region"))
+        st.markdown(
+            f"**{item_id}** · {QUALITY_NAMES[quality]}"
+            + (f" · {region}" if region else "")
+        )
         st.markdown(
             f"""
             💰 **Profit:** {data['profit']:,} silver  
-            🛒 Buy: {data['buy_city']} at {data['buy_price']:,}  
+            🛒 Buy: {data['buy_city']} at {data['buy_price']:,}{substitute}  
             💼 Sell: {data['sell_city']} at {data['sell_price']:,}
             """,
             unsafe_allow_html=False,
@@ -236,68 +343,19 @@ def display_black_market_results(opportunities: List[Dict]):
         st.info("No profitable Black Market opportunities found.")
         return
 
-    # Sort opportunities by profit
-    sorted_opportunities = sorted(
-        opportunities, key=lambda x: x["profit"], reverse=True
-    )
-
     # Display top 11 most profitable opportunities in a 3x4 grid
-    st.subheader("🏴‍☠️ Top Black Market Flips")
-
-    # Split opportunities into rows of 3
-    for i in range(0, min(11, len(sorted_opportunities)), 3):
-        cols = st.columns(3)
-        row_opportunities = sorted_opportunities[i : min(i + 3, 11)]
-        for col, opp in zip(cols, row_opportunities):
-            with col:
-                display_opportunity_card(opp["item_id"], opp)
+    display_top_opportunities(opportunities, "🏴‍☠️ Top Black Market Flips")
 
     # Display full table of opportunities
     st.subheader("📊 All Black Market Opportunities")
-    df_opportunities = pd.DataFrame(sorted_opportunities)
-
-    if "buy_price_date" in df_opportunities.columns:
-        df_opportunities["buy_updated"] = df_opportunities["buy_price_date"].apply(
-            lambda x: format_time_ago(get_hours_ago(x)) if pd.notna(x) else "N/A"
-        )
-    if "sell_price_date" in df_opportunities.columns:
-        # Fix typo in column name (was "ssell_price_date")
-        df_opportunities["sell_updated"] = df_opportunities["sell_price_date"].apply(
-            lambda x: format_time_ago(get_hours_ago(x)) if pd.notna(x) else "N/A"
-        )
-
-    # Reorder and rename columns
-    columns = [
-        "item_id",
-        "profit",
-        "buy_city",
-        "buy_price",
-        "buy_updated",
-        "sell_city",
-        "sell_price",
-        "sell_updated",
-    ]
-    df_opportunities = df_opportunities[columns]
-
-    # Create styled dataframe
-    styled_df = df_opportunities.style.apply(
-        lambda x: [
-            (
-                style_time_cell(val)
-                if isinstance(val, str) and ("m ago" in val or "h ago" in val)
-                else ""
-            )
-            for val in x
-        ],
-        axis=0,
-    )
-
-    # Display the styled dataframe
-    st.dataframe(
-        styled_df,
-        use_container_width=True,
+    display_opportunity_table(
+        opportunities,
+        key="black_market",
         column_config={
             "item_id": "Item",
+            "quality": "Order Quality",
+            "buy_quality": "Buy Quality",
+            "region": "Region",
             "profit": st.column_config.NumberColumn("Profit (Silver)", format="%d"),
             "buy_city": "Buy Location",
             "buy_price": st.column_config.NumberColumn("Buy Price", format="%d"),
@@ -306,5 +364,46 @@ def display_black_market_results(opportunities: List[Dict]):
             "sell_price": st.column_config.NumberColumn("Sell Price", format="%d"),
             "sell_updated": "Sell Updated",
         },
-        hide_index=True,
     )
+
+
+def display_diagnostics(metrics):
+    """
+    Hot-path metrics of this process: a summary of every series, the raw
+    Prometheus text and the latest cProfile report of each scan
+    """
+    metrics.profiling = st.toggle(
+        "Profile background scans",
+        value=metrics.profiling,
+        help="Capture a cProfile report of every background scan run.",
+    )
+
+    summary = pd.DataFrame(metrics.summary())
+    if summary.empty:
+        st.info("No metrics recorded yet.")
+    else:
+        st.dataframe(
+            summary,
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "metric": "Metric",
+                "labels": "Labels",
+                "count": st.column_config.NumberColumn("Count", format="%d"),
+                "total": st.column_config.NumberColumn("Total", format="%.3f"),
+                "mean": st.column_config.NumberColumn("Mean", format="%.4f"),
+                "p50": st.column_config.NumberColumn("p50", format="%.4f"),
+                "p95": st.column_config.NumberColumn("p95", format="%.4f"),
+            },
+        )
+    st.download_button(
+        "⬇️ Prometheus metrics",
+        metrics.render(),
+        file_name="metrics.prom",
+        mime="text/plain",
+    )
+
+    for name, (finished_at, report) in sorted(metrics.profile_reports().items()):
+        finished = pd.Timestamp(finished_at, unit="s", tz="UTC")
+        with st.expander(f"Profile of {name}, {finished:%Y-%m-%d %H:%M:%S} UTC"):
+            st.code(report, language="text")
@@ -1,3 +1,15 @@
+import os
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = PROJECT_ROOT / "data"
+ITEMS_JSON_PATH = PROJECT_ROOT / "config" / "items_cleaned.json"
+# Compiled form of ITEMS_JSON_PATH, rebuilt whenever the JSON changes
+ITEM_CATALOG_PATH = DATA_DIR / "items_catalog.bin"
+# Persisted trigram index over item names and ids
+ITEM_SEARCH_INDEX_PATH = DATA_DIR / "item_search_index.pkl"
+
 RESOURCE_TYPES = [
     "PLANKS",
     "ORE",
@@ -20,13 +32,118 @@ CITIES = [
     "Black Market",
     "Brecilien",
 ]
-BASE_URL = "https://www.albion-online-data.com/api/v2/stats/prices/"
+# Item qualities, all requested in the same batches
+QUALITIES = [1, 2, 3, 4, 5]
+QUALITY_NAMES = {
+    1: "Normal",
+    2: "Good",
+    3: "Outstanding",
+    4: "Excellent",
+    5: "Masterpiece",
+}
+
+# Albion Data API server of each game region
+REGION_HOSTS = {
+    "west": "https://west.albion-online-data.com",
+    "east": "https://east.albion-online-data.com",
+    "europe": "https://europe.albion-online-data.com",
+}
+REGION_NAMES = {"west": "Americas", "east": "Asia", "europe": "Europe"}
+DEFAULT_REGION = "west"
+# Point ALBION_API_HOST at a local stand-in server to run offline, or
+# ALBION_API_HOST_<REGION> to replace a single region's server
+API_HOST = os.environ.get("ALBION_API_HOST")
+REGIONS = {
+    region: os.environ.get(f"ALBION_API_HOST_{region.upper()}", API_HOST or host)
+    for region, host in REGION_HOSTS.items()
+}
+# Regions scanned by the dashboard, e.g. ALBION_REGIONS=west,europe
+SCAN_REGIONS = [
+    region
+    for region in os.environ.get("ALBION_REGIONS", ",".join(REGIONS)).split(",")
+    if region in REGIONS
+]
+BASE_URLS = {region: f"{host}/api/v2/stats/prices/" for region, host in REGIONS.items()}
+HISTORY_URLS = {
+    region: f"{host}/api/v2/stats/history/" for region, host in REGIONS.items()
+}
+BASE_URL = BASE_URLS[DEFAULT_REGION]
+HISTORY_URL = HISTORY_URLS[DEFAULT_REGION]
 
 # API Rate Limits
 RATE_LIMIT_PER_MINUTE = 180
 RATE_LIMIT_PER_5_MINUTES = 300
+# Recent request times of each region's server, shared by every app process
+# on this host
+RATE_LIMIT_STATE_FILE = os.path.join(
+    tempfile.gettempdir(), "albion_rate_limit.{region}.times"
+)
 MAX_URL_LENGTH = 4096
 BATCH_SIZE = 80  # Number of items to combine in a single request
+MAX_WORKERS = 8  # Concurrent batch requests kept in flight by bulk fetches
+
+# Shared HTTP client
+# Kept-alive connections to each region's server: a bulk fetch plus the
+# background scans and Market Overview requests running beside it
+HTTP_POOL_SIZE = 2 * MAX_WORKERS
+HTTP_TIMEOUT = (5, 30)  # Connect and read timeouts in seconds
+HTTP_RETRIES = 5
+HTTP_RETRY_BACKOFF = 1  # Seconds, doubled on each retry
+HTTP_RETRY_STATUSES = [429, 500, 502, 503, 504]
+# Prices URLs of each region whose validators and decoded rows are kept for
+# conditional requests
+CONDITIONAL_CACHE_MAX_URLS = 1024
+
+# Columns of a row returned by the prices endpoint
+PRICE_FIELDS = [
+    "item_id",
+    "city",
+    "quality",
+    "sell_price_min",
+    "sell_price_min_date",
+    "sell_price_max",
+    "sell_price_max_date",
+    "buy_price_min",
+    "buy_price_min_date",
+    "buy_price_max",
+    "buy_price_max_date",
+]
+
+# Local price cache
+PRICE_CACHE_PATH = DATA_DIR / "price_cache.sqlite3"
+PRICE_CACHE_TTL = 600  # Seconds a cached price row stays fresh
+# Per-item TTL overrides, matched against item ids with fnmatch
+PRICE_CACHE_TTLS = {
+    "*_ARTEFACT_*": 1800,
+    "*_RUNE": 1800,
+    "*_SOUL": 1800,
+    "*_RELIC": 1800,
+    "*_SHARD_AVALONIAN": 1800,
+}
+# Least recently used rows are evicted past this; room for a full scan of
+# every quality in each region
+PRICE_CACHE_MAX_ROWS = 500_000 * len(REGIONS)
+
+# Local price history
+# Record the price rows fetched from the API, e.g. ALBION_HISTORY=1
+HISTORY_ENABLED = os.environ.get("ALBION_HISTORY", "").lower() in ("1", "true", "yes")
+HISTORY_DIR = DATA_DIR / "history"  # One directory per region
+HISTORY_RETENTION_DAYS = 30  # Days of snapshots kept; 0 keeps them all
+HISTORY_TIME_SCALE = 24  # Hours per data point requested from /stats/history
+
+# Background refresher
+REFRESH_INTERVAL = 300  # Seconds between background scans
+
+# Result cache shared by all Streamlit sessions
+SHARED_CACHE_TTL = 2 * REFRESH_INTERVAL  # Seconds a scan result stays valid
+SHARED_CACHE_PRICES_TTL = 60  # Seconds a Market Overview price frame stays valid
+SHARED_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Hot-path metrics
+METRICS_FILE = DATA_DIR / "metrics.prom"  # Prometheus text, rewritten after each scan
+# Serve the metrics at http://host:port/metrics as well; 0 disables
+METRICS_PORT = int(os.environ.get("ALBION_METRICS_PORT", "0"))
+METRICS_PROFILE_LINES = 40  # Functions listed in a captured scan profile
 
 # Rune Item IDs
 RUNE_ITEMS = [
@@ -1,8 +1,9 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from config.constants import CITIES, BASE_URL, RUNE_ITEMS, SOUL_ITEMS, RELIC_ITEMS, AVALONIAN_ITEMS
+from config.constants import CITIES, RUNE_ITEMS, SOUL_ITEMS, RELIC_ITEMS, AVALONIAN_ITEMS, SCAN_REGIONS, REGION_NAMES
 from utils.data_fetcher import DataFetcher
+from utils.shared_cache import get_shared_cache
 
 st.set_page_config(
     page_title="Artifact Foundry Calculator",
@@ -10,82 +11,63 @@ st.set_page_config(
     layout="wide"
 )
 
-def fetch_all_cities_data():
-    """Fetch and store all artifact data for all cities in session state."""
-    all_cities_data = {}
-    
-    # Fetch data for each city
-    for city in CITIES:
-        url = f"{BASE_URL}{','.join(RUNE_ITEMS + SOUL_ITEMS + RELIC_ITEMS + AVALONIAN_ITEMS)}.json?locations={city}&qualities=1"
-        city_data = DataFetcher.fetch_artifact_prices(url)
-        if not city_data.empty:
-            all_cities_data[city] = city_data
-    
-    # Store the data in session state
+def fetch_all_cities_data(region: str, refresh: bool = False):
+    """Store the artifact price table of a region in session state.
+
+    The table is shared by every session for a while, so only the first
+    session to open the page in that time fetches it.
+    """
+    cache = get_shared_cache()
+    key = ("artifacts", region)
+    if refresh:
+        cache.invalidate(key)
+    # A requested refresh fetches every price again rather than reading
+    # the price cache
+    max_age = 0 if refresh else None
+
+    def fetch():
+        table = DataFetcher.fetch_artifact_price_table(
+            RUNE_ITEMS + SOUL_ITEMS + RELIC_ITEMS + AVALONIAN_ITEMS,
+            region=region,
+            max_age=max_age
+        )
+        # Not cached when nothing came back, so the next visit tries again
+        return table if not table.empty else None
+
+    all_cities_data = cache.get_or_compute(key, fetch)
+    if all_cities_data is None:
+        st.warning("Could not fetch artifact prices; showing no data.")
+        all_cities_data = pd.DataFrame()
     st.session_state.all_cities_data = all_cities_data
-    
-    # Calculate average prices
-    if all_cities_data:
-        all_data = pd.concat(all_cities_data.values())
-        average_data = all_data.groupby('item_id').agg({
-            'sell_price_min': 'mean',
-            'buy_price_max': 'mean'
-        }).reset_index()
-        average_data['city'] = 'Average'
-        st.session_state.all_cities_data['Average'] = average_data
 
 def get_city_data(city: str) -> dict:
-    """Get artifact data for a specific city."""
-    if 'all_cities_data' not in st.session_state:
-        return {
-            'rune_data': pd.DataFrame(),
-            'soul_data': pd.DataFrame(),
-            'relic_data': pd.DataFrame(),
-            'avalonian_data': pd.DataFrame()
-        }
-    
-    city_data = st.session_state.all_cities_data.get(city, pd.DataFrame())
+    """Get artifact prices for a specific city, one row per expected item."""
+    table = st.session_state.get('all_cities_data', pd.DataFrame())
+    if not table.empty and city in table.index.get_level_values('city'):
+        city_data = table.xs(city, level='city')
+    else:
+        city_data = pd.DataFrame(columns=['sell_price_min', 'buy_price_max'])
     
+    # Items without prices come back as NaN rows
     return {
-        'rune_data': city_data[city_data['item_id'].isin(RUNE_ITEMS)] if not city_data.empty else pd.DataFrame(),
-        'soul_data': city_data[city_data['item_id'].isin(SOUL_ITEMS)] if not city_data.empty else pd.DataFrame(),
-        'relic_data': city_data[city_data['item_id'].isin(RELIC_ITEMS)] if not city_data.empty else pd.DataFrame(),
-        'avalonian_data': city_data[city_data['item_id'].isin(AVALONIAN_ITEMS)] if not city_data.empty else pd.DataFrame()
+        'rune_data': city_data.reindex(RUNE_ITEMS),
+        'soul_data': city_data.reindex(SOUL_ITEMS),
+        'relic_data': city_data.reindex(RELIC_ITEMS),
+        'avalonian_data': city_data.reindex(AVALONIAN_ITEMS)
     }
 
+def format_stack_price(prices: pd.Series) -> pd.Series:
+    """Price of a stack of 50, or 'No Data' where there is no price."""
+    return (prices * 50).map("{:,.0f}".format).where(prices.notna(), 'No Data')
+
 def display_price_table(df: pd.DataFrame, title: str, expected_tiers: list):
-    """Display a price table for the given DataFrame, showing all expected tiers."""
-    # Create a DataFrame with all expected tiers
+    """Display a price table for the given item-indexed DataFrame, showing all expected tiers."""
     all_tiers_df = pd.DataFrame({
         'Artifact': expected_tiers,
-        'Sell Order (50)': ['No Data'] * len(expected_tiers),
-        'Buy Order (50)': ['No Data'] * len(expected_tiers)
+        'Sell Order (50)': format_stack_price(df['sell_price_min']).to_numpy(),
+        'Buy Order (50)': format_stack_price(df['buy_price_max']).to_numpy()
     })
     
-    if not df.empty:
-        # Format the display
-        display_df = df.copy()
-        display_df = display_df[['item_id', 'sell_price_min', 'buy_price_max']]
-        
-        # Multiply prices by 50
-        display_df['sell_price_min'] = display_df['sell_price_min'] * 50
-        display_df['buy_price_max'] = display_df['buy_price_max'] * 50
-        
-        # Rename columns
-        display_df.columns = ['Artifact', 'Sell Order (50)', 'Buy Order (50)']
-        
-        # Format numeric columns
-        for col in ['Sell Order (50)', 'Buy Order (50)']:
-            display_df[col] = display_df[col].map("{:,.0f}".format)
-        
-        # Update all_tiers_df with available data
-        for _, row in display_df.iterrows():
-            tier = row['Artifact']
-            if tier in all_tiers_df['Artifact'].values:
-                idx = all_tiers_df[all_tiers_df['Artifact'] == tier].index[0]
-                all_tiers_df.at[idx, 'Sell Order (50)'] = row['Sell Order (50)']
-                all_tiers_df.at[idx, 'Buy Order (50)'] = row['Buy Order (50)']
-    
     # Display the table
     st.subheader(title)
     st.dataframe(
@@ -96,9 +78,10 @@ def display_price_table(df: pd.DataFrame, title: str, expected_tiers: list):
     
     # Add debug section
     with st.expander("Debug Info"):
+        received = df.dropna(how='all')
         st.write("Raw Data Received:")
-        if not df.empty:
-            st.dataframe(df)
+        if not received.empty:
+            st.dataframe(received)
         else:
             st.write("No data received")
         
@@ -106,15 +89,20 @@ def display_price_table(df: pd.DataFrame, title: str, expected_tiers: list):
         st.write(expected_tiers)
         
         st.write("Processed Data:")
-        st.dataframe(display_df if not df.empty else pd.DataFrame())
+        st.dataframe(all_tiers_df)
 
 def main():
     st.title("🔨 Artifact Foundry Calculator")
     
-    # Initialize session state if not exists
-    if 'all_cities_data' not in st.session_state:
-        with st.spinner("Fetching prices for all cities..."):
-            fetch_all_cities_data()
+    region = st.selectbox(
+        "Region",
+        SCAN_REGIONS,
+        format_func=lambda region: REGION_NAMES.get(region, region),
+        key="region"
+    )
+
+    with st.spinner("Fetching prices for all cities..."):
+        fetch_all_cities_data(region)
     
     # City selection
     st.write("Select City")
@@ -128,10 +116,10 @@ def main():
     city_data = get_city_data(city)
     
     # Display T4 Avalonian Shard price
-    t4_shard_data = city_data['avalonian_data'][city_data['avalonian_data']['item_id'] == 'T4_SHARD_AVALONIAN']
-    if not t4_shard_data.empty:
-        sell_price = t4_shard_data['sell_price_min'].iloc[0] * 50
-        buy_price = t4_shard_data['buy_price_max'].iloc[0] * 50
+    t4_shard_data = city_data['avalonian_data'].loc['T4_SHARD_AVALONIAN']
+    if t4_shard_data.notna().any():
+        sell_price = t4_shard_data['sell_price_min'] * 50
+        buy_price = t4_shard_data['buy_price_max'] * 50
         st.markdown(f"""
         ### T4 Avalonian Shard (50)
         - **Sell Order:** {sell_price:,.0f} silver
@@ -152,7 +140,7 @@ def main():
     # Add a button to force refresh data
     if st.button("🔄 Refresh All Data"):
         with st.spinner("Refreshing prices for all cities..."):
-            fetch_all_cities_data()
+            fetch_all_cities_data(region, refresh=True)
             st.experimental_rerun()
 
 if __name__ == "__main__":
@@ -0,0 +1,71 @@
+import pandas as pd
+
+from config.constants import PRICE_FIELDS
+from utils.change_tracker import ChangeTracker
+
+
+def price_rows(prices):
+    """One row per (item_id, city, sell_price_min), other fields zeroed"""
+    return pd.DataFrame(
+        [
+            {field: 0 for field in PRICE_FIELDS}
+            | {"item_id": item_id, "city": city, "quality": 1, "sell_price_min": price}
+            for item_id, city, price in prices
+        ]
+    )
+
+
+def test_first_sight_is_a_change():
+    tracker = ChangeTracker()
+    df = price_rows([("A", "Martlock", 10), ("B", "Martlock", 20)])
+
+    assert tracker.diff(df) == {"A", "B"}
+    assert tracker.diff(df) == set()
+
+
+def test_only_changed_items_are_reported():
+    tracker = ChangeTracker()
+    tracker.diff(price_rows([("A", "Martlock", 10), ("B", "Martlock", 20)]))
+
+    changed = price_rows([("A", "Martlock", 10), ("B", "Martlock", 21)])
+
+    assert tracker.diff(changed) == {"B"}
+
+
+def test_row_order_and_batching_do_not_matter():
+    tracker = ChangeTracker()
+    tracker.diff(
+        price_rows(
+            [("A", "Martlock", 10), ("A", "Lymhurst", 11), ("B", "Martlock", 20)]
+        )
+    )
+
+    # Same rows, reordered and split over two batches
+    assert tracker.diff(price_rows([("B", "Martlock", 20)])) == set()
+    assert (
+        tracker.diff(price_rows([("A", "Lymhurst", 11), ("A", "Martlock", 10)]))
+        == set()
+    )
+
+
+def test_losing_a_row_is_a_change():
+    tracker = ChangeTracker()
+    tracker.diff(price_rows([("A", "Martlock", 10), ("A", "Lymhurst", 11)]))
+
+    assert tracker.diff(price_rows([("A", "Martlock", 10)])) == {"A"}
+
+
+def test_empty_frame():
+    assert ChangeTracker().diff(pd.DataFrame()) == set()
+
+
+def test_forget():
+    tracker = ChangeTracker()
+    df = price_rows([("A", "Martlock", 10), ("B", "Martlock", 20)])
+    tracker.diff(df)
+
+    tracker.forget(["A", "unknown"])
+    assert tracker.diff(df) == {"A"}
+
+    tracker.forget()
+    assert tracker.diff(df) == {"A", "B"}
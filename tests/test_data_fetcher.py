@@ -0,0 +1,43 @@
+import logging
+
+from config.constants import CITIES
+from utils.data_fetcher import DataFetcher
+from utils.price_parser import PriceColumns
+
+
+def fake_batches(fail):
+    """_fetch_batch stand-in: one row per item, or a 503 for items in `fail`"""
+
+    def fetch_batch(items, max_age=None):
+        if fail & set(items):
+            return 503, None
+        return 200, PriceColumns.from_rows(
+            [(item, "Martlock", 1) + (0, None) * 4 for item in items]
+        )
+
+    return fetch_batch
+
+
+def test_failed_batches_are_counted_and_logged(monkeypatch, caplog):
+    fetcher = DataFetcher()
+    items = [f"T4_ITEM_{i}" for i in range(1000)]
+    batches = fetcher.batch_processor.batch_items(items, CITIES)
+    assert len(batches) > 2
+    monkeypatch.setattr(fetcher, "_fetch_batch", fake_batches({batches[1][0]}))
+
+    with caplog.at_level(logging.WARNING, logger="utils.data_fetcher"):
+        df = fetcher.fetch_bulk_prices(items, max_workers=2)
+
+    assert df.attrs["failed_batches"] == 1
+    assert set(df["item_id"]) == set(items) - set(batches[1])
+    assert "Batch 2 of" in caplog.text
+
+
+def test_no_failures(monkeypatch):
+    fetcher = DataFetcher()
+    monkeypatch.setattr(fetcher, "_fetch_batch", fake_batches(set()))
+
+    df = fetcher.fetch_bulk_prices(["T4_BAG", "T5_BAG"])
+
+    assert df.attrs["failed_batches"] == 0
+    assert sorted(df["item_id"]) == ["T4_BAG", "T5_BAG"]
@@ -0,0 +1,86 @@
+from utils.history_store import HistoryStore
+from utils.price_parser import PriceColumns
+
+DAY = 86400
+START = 1_700_000_000  # 2023-11-14 22:13 UTC
+
+
+def columns(prices):
+    """Price columns with one row per (item_id, city, quality, sell_price_min)"""
+    return PriceColumns.from_rows(
+        [
+            (item_id, city, quality, price, "2023-11-14T20:00:00") + (0, None) * 3
+            for item_id, city, quality, price in prices
+        ]
+    )
+
+
+def snapshot_rows(store, item_id):
+    df = store.query(item_id)
+    return list(zip(df["city"], df["quality"], df["sell_price_min"]))
+
+
+def test_only_changed_rows_are_written(tmp_path):
+    store = HistoryStore(tmp_path)
+    first = [
+        ("A", "Martlock", 1, 10),
+        ("A", "Martlock", 2, 20),
+        ("B", "Martlock", 1, 5),
+    ]
+
+    assert store.append_snapshot(columns(first), START) == 3
+    assert store.append_snapshot(columns(first), START + 300) == 0
+
+    second = [
+        ("A", "Martlock", 1, 10),
+        ("A", "Martlock", 2, 25),
+        ("B", "Martlock", 1, 5),
+    ]
+    assert store.append_snapshot(columns(second), START + 600) == 1
+
+    assert snapshot_rows(store, "A") == [
+        ("Martlock", 1, 10),
+        ("Martlock", 2, 20),
+        ("Martlock", 2, 25),
+    ]
+    assert snapshot_rows(store, "B") == [("Martlock", 1, 5)]
+
+
+def test_a_price_changing_back_is_written(tmp_path):
+    store = HistoryStore(tmp_path)
+    for offset, price in enumerate([10, 11, 10]):
+        store.append_snapshot(columns([("A", "Martlock", 1, price)]), START + offset)
+
+    assert [row[2] for row in snapshot_rows(store, "A")] == [10, 11, 10]
+
+
+def test_new_city_or_quality_is_written(tmp_path):
+    store = HistoryStore(tmp_path)
+    store.append_snapshot(columns([("A", "Martlock", 1, 10)]), START)
+
+    written = store.append_snapshot(
+        columns([("A", "Martlock", 1, 10), ("A", "Lymhurst", 1, 10)]), START + 1
+    )
+
+    assert written == 1
+
+
+def test_a_new_store_picks_up_todays_rows(tmp_path):
+    rows = [("A", "Martlock", 1, 10), ("A", "Martlock", 2, 20)]
+    HistoryStore(tmp_path).append_snapshot(columns(rows), START)
+
+    # e.g. after a restart of the app
+    store = HistoryStore(tmp_path)
+    assert store.append_snapshot(columns(rows), START + 300) == 0
+
+
+def test_old_snapshot_days_are_pruned(tmp_path):
+    store = HistoryStore(tmp_path, retention_days=2)
+    for day in range(4):
+        store.append_snapshot(
+            columns([("A", "Martlock", 1, 10 + day)]), START + day * DAY
+        )
+
+    days = sorted(path.name for path in (tmp_path / "snapshots").iterdir())
+    assert days == ["2023-11-15", "2023-11-16", "2023-11-17"]
+    assert [row[2] for row in snapshot_rows(store, "A")] == [11, 12, 13]
@@ -0,0 +1,32 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.item_catalog import ItemCatalog
+
+
+def write_items(path, n_items):
+    items = [
+        {
+            "UniqueName": f"T4_ITEM_{i}",
+            "Index": str(i),
+            "LocalizedNames": {"EN-US": f"Item {i}"},
+        }
+        for i in range(n_items)
+    ]
+    path.write_text(json.dumps(items), encoding="utf-8")
+
+
+def test_concurrent_builds_leave_one_valid_catalog(tmp_path):
+    source = tmp_path / "items.json"
+    path = tmp_path / "items.catalog"
+    write_items(source, 5000)
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda _: ItemCatalog.build(source, path), range(8)))
+
+    catalog = ItemCatalog(path)
+    assert len(catalog) == 5000
+    assert catalog.indices[-1] == 4999
+    # No temporary files are left behind
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["items.catalog", "items.json"]
+    catalog.close()
@@ -0,0 +1,88 @@
+import pandas as pd
+
+from analysis.opportunity_index import OpportunityIndex
+
+
+def rows(*item_ids):
+    return pd.DataFrame({"item_id": list(item_ids), "sell_price_min": 10})
+
+
+def opportunity(item_id, quality, profit):
+    return {"item_id": item_id, "quality": quality, "profit": profit}
+
+
+def keys(opportunities):
+    return [(o["item_id"], o["quality"]) for o in opportunities]
+
+
+def test_top_is_sorted_by_profit():
+    index = OpportunityIndex()
+    index.update(
+        ["A", "B"],
+        [opportunity("A", 1, 50), opportunity("B", 1, 80), opportunity("A", 2, 60)],
+    )
+
+    assert keys(index.top()) == [("B", 1), ("A", 2), ("A", 1)]
+    assert keys(index.top(2)) == [("B", 1), ("A", 2)]
+    assert len(index) == 3
+
+
+def test_update_replaces_every_quality_of_an_item():
+    index = OpportunityIndex()
+    index.update(["A"], [opportunity("A", 1, 50), opportunity("A", 2, 60)])
+
+    index.update(["A"], [opportunity("A", 3, 10)])
+
+    assert keys(index.top()) == [("A", 3)]
+
+
+def test_update_removes_items_without_opportunities():
+    index = OpportunityIndex()
+    index.update(["A", "B"], [opportunity("A", 1, 50), opportunity("B", 1, 80)])
+
+    index.update(["B"], [])
+
+    assert keys(index.top()) == [("A", 1)]
+
+
+def test_update_moves_an_item_whose_profit_changed():
+    index = OpportunityIndex()
+    index.update(["A", "B"], [opportunity("A", 1, 50), opportunity("B", 1, 80)])
+
+    index.update(["A"], [opportunity("A", 1, 100)])
+
+    assert keys(index.top()) == [("A", 1), ("B", 1)]
+    assert index.top(1)[0]["profit"] == 100
+
+
+def test_equal_profits_are_all_kept():
+    index = OpportunityIndex()
+    index.update(["A", "B"], [opportunity("A", 1, 50), opportunity("B", 1, 50)])
+
+    index.update(["A"], [])
+
+    assert keys(index.top()) == [("B", 1)]
+
+
+def test_retain_drops_other_items_and_forgets_their_rows():
+    index = OpportunityIndex()
+    index.update(["A", "B"], [opportunity("A", 1, 50), opportunity("B", 1, 80)])
+    index.tracker.diff(rows("A", "B"))
+
+    index.retain({"A"})
+
+    assert keys(index.top()) == [("A", 1)]
+    # B is recomputed when it comes back, even with the same rows
+    assert index.tracker.diff(rows("A", "B")) == {"B"}
+
+
+def test_clear():
+    index = OpportunityIndex()
+    index.update(["A"], [opportunity("A", 1, 50)])
+    index.tracker.diff(rows("A"))
+
+    index.clear()
+
+    assert index.top() == []
+    assert len(index) == 0
+    assert index.tracker.diff(rows("A")) == {"A"}
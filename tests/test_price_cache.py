@@ -0,0 +1,164 @@
+import pytest
+
+from utils import price_cache
+from utils.price_cache import PriceCache
+
+CITIES = ["Martlock", "Lymhurst"]
+QUALITIES = [1, 2]
+
+
+class FakeTime:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(price_cache, "time", clock)
+    return clock
+
+
+def item_rows(item_id, price=100):
+    """A full set of rows for one item, in PRICE_FIELDS order"""
+    return [
+        (item_id, city, quality, price, None, 0, None, 0, None, 0, None)
+        for city in CITIES
+        for quality in QUALITIES
+    ]
+
+
+def make_cache(tmp_path, **kwargs):
+    kwargs.setdefault("default_ttl", 600)
+    kwargs.setdefault("ttls", {"*_ARTEFACT_*": 1800})
+    return PriceCache(tmp_path / "prices.sqlite3", **kwargs)
+
+
+def row_count(cache):
+    return cache._conn.execute("SELECT COUNT(*) FROM prices").fetchone()[0]
+
+
+def test_fresh_items_are_returned(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.put(item_rows("T4_BAG"))
+
+    rows, stale = cache.get(["T4_BAG", "T5_BAG"], CITIES, QUALITIES)
+
+    assert sorted(rows) == sorted(item_rows("T4_BAG"))
+    assert stale == ["T5_BAG"]
+
+
+def test_items_missing_a_row_are_stale(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.put(item_rows("T4_BAG")[:-1])
+
+    rows, stale = cache.get(["T4_BAG"], CITIES, QUALITIES)
+
+    assert rows == []
+    assert stale == ["T4_BAG"]
+
+
+def test_rows_expire_after_the_ttl_of_their_item(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.put(item_rows("T4_BAG") + item_rows("T4_ARTEFACT_2H_CLEAVER_HELL"))
+    items = ["T4_BAG", "T4_ARTEFACT_2H_CLEAVER_HELL"]
+
+    clock.now += 599
+    assert cache.get(items, CITIES, QUALITIES)[1] == []
+    clock.now += 2
+    assert cache.get(items, CITIES, QUALITIES)[1] == ["T4_BAG"]
+    clock.now += 1200
+    assert cache.get(items, CITIES, QUALITIES)[1] == items
+
+
+def test_max_age(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.put(item_rows("T4_BAG"))
+    clock.now += 100
+
+    assert cache.get(["T4_BAG"], CITIES, QUALITIES, max_age=200)[1] == []
+    assert cache.get(["T4_BAG"], CITIES, QUALITIES, max_age=50)[1] == ["T4_BAG"]
+    # 0 bypasses the cache even for rows written this instant
+    cache.put(item_rows("T4_BAG"))
+    assert cache.get(["T4_BAG"], CITIES, QUALITIES, max_age=0)[1] == ["T4_BAG"]
+
+
+def test_regions_are_kept_apart(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.put(item_rows("T4_BAG", 100), region="west")
+    cache.put(item_rows("T4_BAG", 200), region="east")
+
+    west, _ = cache.get(["T4_BAG"], CITIES, QUALITIES, region="west")
+    east, _ = cache.get(["T4_BAG"], CITIES, QUALITIES, region="east")
+    _, stale = cache.get(["T4_BAG"], CITIES, QUALITIES, region="europe")
+
+    assert {row[3] for row in west} == {100}
+    assert {row[3] for row in east} == {200}
+    assert stale == ["T4_BAG"]
+
+
+def test_row_count_follows_puts(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.put(item_rows("A") + item_rows("B"))
+    # Replacing rows does not add to the count
+    cache.put(item_rows("A", 200))
+    cache.put(item_rows("A"), region="east")
+
+    assert cache._row_count == row_count(cache) == 12
+
+    cache.clear()
+    assert cache._row_count == row_count(cache) == 0
+
+
+def test_row_count_is_restored_on_open(tmp_path, clock):
+    make_cache(tmp_path).put(item_rows("A"))
+
+    assert make_cache(tmp_path)._row_count == 4
+
+
+def test_least_recently_used_items_are_evicted(tmp_path, clock):
+    # Room for two items of four rows each
+    cache = make_cache(tmp_path, max_rows=8)
+    cache.put(item_rows("A"))
+    clock.now += 1
+    cache.put(item_rows("B"))
+    clock.now += 1
+    # Reading A makes B the least recently used
+    cache.get(["A"], CITIES, QUALITIES)
+    clock.now += 1
+
+    cache.put(item_rows("C"))
+
+    _, stale = cache.get(["A", "B", "C"], CITIES, QUALITIES)
+    assert stale == ["B"]
+    assert cache._row_count == row_count(cache) <= cache.max_rows
+
+
+def test_eviction_frees_headroom(tmp_path, clock):
+    cache = make_cache(tmp_path, max_rows=40)
+    for item_id in range(10):
+        cache.put(item_rows(f"T4_{item_id}"))
+        clock.now += 1
+
+    cache.put(item_rows("T4_NEW"))
+
+    # 4 rows over the limit, plus 10% of max_rows
+    assert row_count(cache) == 44 - 4 - 4
+    assert cache._row_count == row_count(cache)
+    _, stale = cache.get(["T4_0", "T4_NEW"], CITIES, QUALITIES)
+    assert stale == ["T4_0"]
+
+
+def test_schema_change_drops_the_old_table(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.put(item_rows("A"))
+    cache._conn.execute("PRAGMA user_version = 1")
+    cache._conn.commit()
+
+    reopened = make_cache(tmp_path)
+
+    assert reopened._row_count == 0
+    assert reopened.get(["A"], CITIES, QUALITIES)[1] == ["A"]
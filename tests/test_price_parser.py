@@ -0,0 +1,73 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config.constants import PRICE_FIELDS
+from utils.price_parser import PriceColumns, decode_price_columns, decode_prices
+
+FIXTURE = Path(__file__).parent / "fixtures" / "prices.json"
+
+
+def expected_rows():
+    """Rows of the fixture in PRICE_FIELDS order, decoded the slow way"""
+    return [
+        tuple(record[field] for field in PRICE_FIELDS)
+        for record in json.loads(FIXTURE.read_text())
+    ]
+
+
+def test_columns_round_trip_the_fixture():
+    columns = decode_price_columns(FIXTURE.read_bytes())
+
+    rows = list(columns.rows())
+
+    assert len(columns) == 3
+    assert rows[:2] == expected_rows()[:2]
+    # A missing price becomes 0, a missing date stays None, and fields
+    # outside PRICE_FIELDS are dropped
+    record = dict(zip(PRICE_FIELDS, rows[2]))
+    assert record["sell_price_min"] == 0
+    assert record["sell_price_min_date"] is None
+    assert record["sell_price_max"] == 9000
+
+
+def test_str_and_bytes_payloads_decode_alike():
+    payload = FIXTURE.read_text()
+    assert list(decode_price_columns(payload).rows()) == list(
+        decode_price_columns(payload.encode()).rows()
+    )
+
+
+def test_frame_types_and_dates():
+    df = decode_prices(FIXTURE.read_bytes())
+
+    assert list(df.columns) == PRICE_FIELDS
+    assert isinstance(df["item_id"].dtype, pd.CategoricalDtype)
+    assert df["item_id"].tolist() == ["T4_BAG", "T4_BAG", "T5_CAPE"]
+    assert df["city"].tolist() == ["Martlock", "Black Market", "Martlock"]
+    assert df["quality"].dtype == np.int64
+    assert df["sell_price_min"].tolist() == [4200, 0, 0]
+    assert df["buy_price_max"].tolist() == [3900, 6500, 0]
+
+    dates = df["sell_price_min_date"]
+    assert dates.iloc[0] == pd.Timestamp("2024-05-01T12:00:00")
+    # Both the placeholder date and a missing one are NaT
+    assert dates.iloc[1:].isna().all()
+
+
+def test_concat_recodes_string_tables():
+    payload = FIXTURE.read_bytes()
+    first = decode_price_columns(payload)
+    second = PriceColumns.from_rows(list(first.rows())[::-1])
+
+    merged = PriceColumns.concat([first, None, second])
+
+    assert len(merged) == 6
+    assert list(merged.rows()) == list(first.rows()) + list(second.rows())
+
+
+def test_empty_payload():
+    assert len(decode_price_columns(b"[]")) == 0
+    assert decode_prices(b"[]").empty
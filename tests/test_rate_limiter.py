@@ -0,0 +1,90 @@
+import asyncio
+import threading
+from bisect import bisect_right
+
+import pytest
+
+from utils.rate_limiter import RateLimiter
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def drive(limiter: RateLimiter, clock: FakeClock, duration: float):
+    """Send requests as fast as the limiter allows for `duration` seconds"""
+    sent = []
+    end = clock.now + duration
+    while clock.now < end:
+        wait = limiter._take()
+        if wait > 0:
+            clock.now += wait
+        else:
+            sent.append(clock.now)
+    return sent
+
+
+def max_in_window(times, window: float) -> int:
+    """Most requests inside any window (t - window, t]"""
+    return max(i + 1 - bisect_right(times, t - window) for i, t in enumerate(times))
+
+
+@pytest.mark.parametrize("state_file", [False, True])
+def test_windows_never_exceed_their_limits(tmp_path, state_file):
+    clock = FakeClock()
+    limiter = RateLimiter(
+        180,
+        300,
+        state_file=str(tmp_path / "limit.state") if state_file else None,
+        clock=clock,
+    )
+    sent = drive(limiter, clock, 900)
+
+    assert max_in_window(sent, 60) == 180
+    assert max_in_window(sent, 300) == 300
+    # The budget is used up rather than merely respected
+    assert len(sent) == 900
+
+
+def test_burst_then_waits_for_the_oldest_request():
+    clock = FakeClock()
+    limiter = RateLimiter(3, 5, clock=clock)
+    assert [limiter._take() for _ in range(3)] == [0, 0, 0]
+
+    clock.now += 10
+    assert limiter._take() == pytest.approx(50)
+    clock.now += 50
+    assert limiter._take() == 0
+
+
+def test_limiters_sharing_a_state_file_share_the_budget(tmp_path):
+    clock = FakeClock()
+    state_file = str(tmp_path / "limit.state")
+    first = RateLimiter(2, 10, state_file=state_file, clock=clock)
+    second = RateLimiter(2, 10, state_file=state_file, clock=clock)
+
+    assert first._take() == 0
+    assert second._take() == 0
+    assert first._take() > 0
+    assert second._take() > 0
+
+
+def test_acquire_async_takes_the_file_lock_off_the_event_loop(tmp_path):
+    limiter = RateLimiter(2, 10, state_file=str(tmp_path / "limit.state"))
+    threads = []
+    take = limiter._take
+
+    def recording_take():
+        threads.append(threading.current_thread())
+        return take()
+
+    limiter._take = recording_take
+    asyncio.run(limiter.acquire_async())
+
+    assert threads and threading.main_thread() not in threads
+    assert limiter._take() == 0
+    assert limiter._take() > 0
@@ -0,0 +1,235 @@
+import inspect
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Optional
+
+from config.constants import (
+    METRICS_FILE,
+    REFRESH_INTERVAL,
+    SCAN_REGIONS,
+    SHARED_CACHE_TTL,
+)
+from .metrics import get_metrics
+from .shared_cache import SharedCache, get_shared_cache
+
+
+def scan_key(name: str) -> tuple:
+    """Shared cache key under which the result of a job is published"""
+    return ("scan", name)
+
+
+def default_jobs() -> Dict[str, Callable[[], Any]]:
+    """
+    The scans kept up to date for the dashboard, keyed by job name. Each
+    job covers every region in SCAN_REGIONS, scanned in parallel, and takes
+    the max age in seconds of the cached prices it may use.
+    """
+    # Imported here so utils does not depend on analysis at import time
+    from analysis.market_analyzer import MarketAnalyzer
+
+    return {
+        "arbitrage": lambda max_age: MarketAnalyzer.stream_region_analysis(
+            "Arbitrage Opportunities", SCAN_REGIONS, max_age=max_age
+        ),
+        "black_market": lambda max_age: MarketAnalyzer.stream_region_analysis(
+            "Black Market", SCAN_REGIONS, max_age=max_age
+        ),
+    }
+
+
+class BackgroundRefresher:
+    """
+    Runs each job on its own daemon thread every `interval` seconds and
+    publishes the result to the shared cache under scan_key(name), so
+    readers never wait on a scan (except for the very first one).
+    `refresh` wakes a job up early.
+
+    Jobs are called with the max age of the cached prices they may use.
+    Scheduled runs pass `interval`, so each run fetches again whatever the
+    previous run saw instead of rereading it from the price cache, while
+    `refresh` passes 0 by default to bypass the cache.
+
+    A job may be a generator: each value it yields is published as the
+    partial result of the run in progress, and its return value becomes
+    the result. Each run is profiled when metrics profiling is on, and the
+    metrics are written to METRICS_FILE after it.
+    """
+
+    def __init__(
+        self,
+        jobs: Dict[str, Callable[[Optional[float]], Any]],
+        interval: float = REFRESH_INTERVAL,
+        cache: Optional[SharedCache] = None,
+        ttl: float = SHARED_CACHE_TTL,
+    ):
+        self.jobs = jobs
+        self.interval = interval
+        self.cache = cache or get_shared_cache()
+        self.ttl = ttl
+        self._updated_at: Dict[str, float] = {}
+        self._errors: Dict[str, str] = {}
+        self._partials: Dict[str, Any] = {}
+        # Last partial result of the latest successful run of each job
+        self._last_partials: Dict[str, Any] = {}
+        self._running: Dict[str, bool] = {name: False for name in jobs}
+        self._runs: Dict[str, int] = {name: 0 for name in jobs}
+        # Max age of cached prices requested for the next run of a job
+        self._max_ages: Dict[str, float] = {}
+        self._wake = {name: threading.Event() for name in jobs}
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: Dict[str, threading.Thread] = {}
+
+    def start(self):
+        """Start one worker thread per job; calling it again is a no-op"""
+        for name in self.jobs:
+            if name in self._threads:
+                continue
+            thread = threading.Thread(
+                target=self._work, args=(name,), name=f"refresh-{name}", daemon=True
+            )
+            self._threads[name] = thread
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for event in self._wake.values():
+            event.set()
+
+    def _work(self, name: str):
+        while not self._stop.is_set():
+            self._wake[name].clear()
+            with self._condition:
+                self._running[name] = True
+                max_age = self._max_ages.pop(name, self.interval)
+            try:
+                with get_metrics().profile(name):
+                    result = self._run_job(name, max_age)
+                error = None
+            except Exception:
+                result = None
+                error = traceback.format_exc()
+                print(f"Background refresh of {name} failed:\n{error}")
+
+            with self._condition:
+                if error is None:
+                    self.cache.put(scan_key(name), result, self.ttl)
+                    self._updated_at[name] = time.time()
+                    self._errors.pop(name, None)
+                    self._last_partials[name] = self._partials.get(name)
+                else:
+                    self._errors[name] = error
+                self._runs[name] += 1
+                self._running[name] = False
+                self._partials.pop(name, None)
+                self._condition.notify_all()
+
+            try:
+                get_metrics().write(METRICS_FILE)
+            except OSError as e:
+                print(f"Failed to write metrics to {METRICS_FILE}: {e}")
+
+            self._wake[name].wait(self.interval)
+
+    def _run_job(self, name: str, max_age: float) -> Any:
+        output = self.jobs[name](max_age)
+        if not inspect.isgenerator(output):
+            return output
+        while True:
+            try:
+                partial = next(output)
+            except StopIteration as stop:
+                return stop.value
+            with self._condition:
+                self._partials[name] = partial
+                self._condition.notify_all()
+
+    def latest(self, name: str) -> Any:
+        """Latest result of a job, or None if there is none or it has expired"""
+        return self.cache.get(scan_key(name))
+
+    def partial(self, name: str) -> Any:
+        """Latest value yielded by the run of a job in progress, if any"""
+        with self._condition:
+            return self._partials.get(name)
+
+    def last_partial(self, name: str) -> Any:
+        """
+        Last value yielded by the latest successful run of a job, e.g. the
+        final progress of a scan, if any
+        """
+        with self._condition:
+            return self._last_partials.get(name)
+
+    def runs(self, name: str) -> int:
+        """Number of runs of a job that have finished, successful or not"""
+        with self._condition:
+            return self._runs[name]
+
+    def ensure_running(self, name: str):
+        """Start a run of a job unless one is already in progress"""
+        with self._condition:
+            if not self._running[name]:
+                self._wake[name].set()
+
+    def wait_for_update(self, timeout: Optional[float] = None):
+        """Block until any job publishes a partial or final result"""
+        with self._condition:
+            self._condition.wait(timeout)
+
+    def updated_at(self, name: str) -> Optional[float]:
+        """Epoch seconds of the latest successful run of a job"""
+        with self._condition:
+            return self._updated_at.get(name)
+
+    def error(self, name: str) -> Optional[str]:
+        """Traceback of the latest run of a job if it failed"""
+        with self._condition:
+            return self._errors.get(name)
+
+    def wait_for(self, name: str, timeout: Optional[float] = None) -> Any:
+        """Block until a job has run at least once, then return its latest result"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._runs[name] > 0, timeout)
+        return self.latest(name)
+
+    def refresh(
+        self,
+        name: str,
+        wait: bool = False,
+        timeout: Optional[float] = None,
+        max_age: float = 0,
+    ):
+        """
+        Run a job now instead of at its next interval, with cached prices
+        no older than `max_age` seconds
+        """
+        with self._condition:
+            runs = self._runs[name]
+            self._max_ages[name] = min(max_age, self._max_ages.get(name, max_age))
+        self._wake[name].set()
+        if wait:
+            # A run already in progress may have started before the request,
+            # so wait for the one after it
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._runs[name] >= runs + 2
+                    or (self._runs[name] > runs and not self._wake[name].is_set()),
+                    timeout,
+                )
+        return self.latest(name)
+
+
+_shared_refresher: Optional[BackgroundRefresher] = None
+_shared_refresher_lock = threading.Lock()
+
+
+def get_background_refresher() -> BackgroundRefresher:
+    """Return the refresher shared by every session, starting it on first use"""
+    global _shared_refresher
+    with _shared_refresher_lock:
+        if _shared_refresher is None:
+            _shared_refresher = BackgroundRefresher(default_jobs())
+            _shared_refresher.start()
+        return _shared_refresher
@@ -1,51 +1,61 @@
-import time
-from typing import List, Dict
+from typing import List, Dict, Optional, Sequence
 from urllib.parse import urlencode
 from config.constants import *
+from .metrics import get_metrics
+from .rate_limiter import get_rate_limiter
 
 
 class BatchProcessor:
-    def __init__(self):
-        self.request_timestamps = []
-        self.last_request_time = 0
+    def __init__(self, region: str = DEFAULT_REGION):
+        self.region = region
+        self.rate_limiter = get_rate_limiter(region)
 
     def check_rate_limits(self):
-        current_time = time.time()
-        # Clean old timestamps
-        self.request_timestamps = [
-            ts for ts in self.request_timestamps if current_time - ts < 300  # 5 minutes
-        ]
+        """Block until the region's shared rate limiter admits another request"""
+        with get_metrics().timer("albion_rate_limit_wait_seconds", region=self.region):
+            self.rate_limiter.acquire()
 
-        # Check limits
-        if len(self.request_timestamps) >= RATE_LIMIT_PER_5_MINUTES:
-            sleep_time = 300 - (current_time - self.request_timestamps[0])
-            if sleep_time > 0:
-                time.sleep(sleep_time)
-                return self.check_rate_limits()
-
-        minute_requests = len(
-            [ts for ts in self.request_timestamps if current_time - ts < 60]
-        )
-        if minute_requests >= RATE_LIMIT_PER_MINUTE:
-            sleep_time = 60 - (
-                current_time - self.request_timestamps[-RATE_LIMIT_PER_MINUTE]
-            )
-            if sleep_time > 0:
-                time.sleep(sleep_time)
-                return self.check_rate_limits()
-
-    def create_batched_url(self, items: List[str], locations: List[str]) -> List[str]:
+    def create_batched_url(
+        self,
+        items: List[str],
+        locations: List[str],
+        base_url: Optional[str] = None,
+        extra_params: Optional[Dict[str, str]] = None,
+        qualities: Sequence[int] = QUALITIES,
+    ) -> List[str]:
         """
         Creates batched URLs ensuring each URL is within length limit
-        Returns a list of valid URLs
+        Returns a list of valid URLs, each requesting every quality, on the
+        region's prices endpoint unless another `base_url` is given
+        """
+        base_url = base_url or BASE_URLS[self.region]
+        base_query = self._base_query(locations, extra_params, qualities)
+        metrics = get_metrics()
+        urls = []
+        for batch in self.batch_items(
+            items, locations, base_url, extra_params, qualities
+        ):
+            metrics.observe("albion_batch_items", len(batch))
+            urls.append(f"{base_url}{','.join(batch)}.json?{base_query}")
+        return urls
+
+    def batch_items(
+        self,
+        items: List[str],
+        locations: List[str],
+        base_url: Optional[str] = None,
+        extra_params: Optional[Dict[str, str]] = None,
+        qualities: Sequence[int] = QUALITIES,
+    ) -> List[List[str]]:
         """
-        base_url = BASE_URL
-        locations_param = ",".join(locations)
-        base_params = {"locations": locations_param, "qualities": "1"}
-        base_query = urlencode(base_params)
+        Split items into the batches create_batched_url requests together,
+        each fitting in one URL within the length limit
+        """
+        base_url = base_url or BASE_URLS[self.region]
+        base_query = self._base_query(locations, extra_params, qualities)
         base_length = len(base_url) + len(".json?") + len(base_query)
 
-        urls = []
+        batches = []
         current_batch = []
         current_url_length = base_length
 
@@ -60,20 +70,27 @@ class BatchProcessor:
                 current_batch.append(item)
                 current_url_length = test_length
             else:
-                # Current batch is full, create URL and start new batch
+                # Current batch is full, start new batch with current item
                 if current_batch:
-                    items_param = ",".join(current_batch)
-                    url = f"{base_url}{items_param}.json?{base_query}"
-                    urls.append(url)
-
-                # Start new batch with current item
+                    batches.append(current_batch)
                 current_batch = [item]
                 current_url_length = base_length + len(item)
 
         # Add remaining items
         if current_batch:
-            items_param = ",".join(current_batch)
-            url = f"{base_url}{items_param}.json?{base_query}"
-            urls.append(url)
+            batches.append(current_batch)
 
-        return urls
+        return batches
+
+    @staticmethod
+    def _base_query(
+        locations: List[str],
+        extra_params: Optional[Dict[str, str]],
+        qualities: Sequence[int],
+    ) -> str:
+        base_params = {
+            "locations": ",".join(locations),
+            "qualities": ",".join(str(quality) for quality in qualities),
+        }
+        base_params.update(extra_params or {})
+        return urlencode(base_params)
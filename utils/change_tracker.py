@@ -0,0 +1,124 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional, Set
+
+import pandas as pd
+
+from config.constants import CONDITIONAL_CACHE_MAX_URLS, DEFAULT_REGION, PRICE_FIELDS
+from .price_parser import PriceColumns
+
+
+def content_digest(content: bytes) -> bytes:
+    return hashlib.blake2b(content, digest_size=16).digest()
+
+
+class ConditionalEntry(NamedTuple):
+    """What was last received for a URL"""
+
+    etag: Optional[str]
+    last_modified: Optional[str]
+    digest: bytes  # Hash of the response body
+    columns: PriceColumns  # The body, decoded
+
+
+class ConditionalCache:
+    """
+    Validators and decoded rows of the latest response to each prices URL.
+
+    Requests for a known URL are made conditional (If-None-Match /
+    If-Modified-Since) so the API can answer 304 Not Modified, and a body
+    whose hash matches the previous one is not decoded again. Either way
+    the previously decoded rows are reused. The least recently used URLs
+    are dropped past `max_urls`.
+    """
+
+    def __init__(self, max_urls: int = CONDITIONAL_CACHE_MAX_URLS):
+        self.max_urls = max_urls
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, ConditionalEntry]" = OrderedDict()
+
+    def get(self, url: str) -> Optional[ConditionalEntry]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def put(self, url: str, entry: ConditionalEntry):
+        with self._lock:
+            self._entries[url] = entry
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_urls:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def request_headers(entry: Optional[ConditionalEntry]) -> Dict[str, str]:
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class ChangeTracker:
+    """
+    Tells which items' price rows changed since this tracker last saw them.
+
+    Each item is summarized by an order-independent hash of all its rows
+    (every city and quality in the batch), so a batch can be split and
+    regrouped differently between scans.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hashes: Dict[str, int] = {}
+
+    def diff(self, df: pd.DataFrame) -> Set[str]:
+        """Item ids in `df` whose rows differ from when they were last seen"""
+        if df.empty:
+            return set()
+        row_hashes = pd.util.hash_pandas_object(
+            df[[field for field in PRICE_FIELDS if field in df.columns]], index=False
+        )
+        item_hashes = row_hashes.groupby(
+            df["item_id"].to_numpy(dtype=str), sort=False
+        ).sum()
+        with self._lock:
+            changed = {
+                item_id
+                for item_id, item_hash in item_hashes.items()
+                if self._hashes.get(item_id) != item_hash
+            }
+            self._hashes.update(item_hashes.items())
+        return changed
+
+    def forget(self, item_ids: Optional[Iterable[str]] = None):
+        """Treat `item_ids` (every item by default) as changed when next seen"""
+        with self._lock:
+            if item_ids is None:
+                self._hashes.clear()
+            else:
+                for item_id in item_ids:
+                    self._hashes.pop(item_id, None)
+
+
+_shared_conditional_caches: Dict[str, ConditionalCache] = {}
+_shared_lock = threading.Lock()
+
+
+def get_conditional_cache(region: str = DEFAULT_REGION) -> ConditionalCache:
+    """
+    Return the conditional request cache of a region, shared by every fetch
+    path. Regions are kept apart even when they share a server URL.
+    """
+    with _shared_lock:
+        if region not in _shared_conditional_caches:
+            _shared_conditional_caches[region] = ConditionalCache()
+        return _shared_conditional_caches[region]
@@ -1,31 +1,40 @@
+import logging
 import requests
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
 import pandas as pd
 import time
-import streamlit as st
-from typing import Optional, List
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, Optional, List, Sequence, Tuple, TypeVar
+from urllib.parse import urlsplit, urlunsplit, parse_qs, unquote
 from .batch_processor import BatchProcessor
-from config.constants import BATCH_SIZE, CITIES
+from .change_tracker import (
+    ConditionalCache,
+    ConditionalEntry,
+    content_digest,
+    get_conditional_cache,
+)
+from .history_store import get_history_store
+from .http_client import get_http_client
+from .metrics import get_metrics
+from .price_cache import get_price_cache
+from .price_parser import DATE_FIELDS, PriceColumns, decode_price_columns
+from config.constants import (
+    CITIES,
+    DEFAULT_REGION,
+    MAX_WORKERS,
+    HISTORY_ENABLED,
+    QUALITIES,
+    SCAN_REGIONS,
+)
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
 
 
 class DataFetcher:
-    def __init__(self):
-        self.batch_processor = BatchProcessor()
-        self.session = self.create_session()
-
-    def create_session(self):
-        """Create a requests session with retry strategy"""
-        session = requests.Session()
-        retry_strategy = Retry(
-            total=5,  # number of retries
-            backoff_factor=1,  # delay between retries
-            status_forcelist=[429, 500, 502, 503, 504],  # status codes to retry on
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        return session
+    def __init__(self, region: str = DEFAULT_REGION):
+        self.region = region
+        self.batch_processor = BatchProcessor(region)
 
     @staticmethod
     def construct_item_id(resource: str, tier: int, enchantment: int) -> str:
@@ -34,90 +43,377 @@ class DataFetcher:
         return f"T{tier}_{resource}_LEVEL{enchantment}@{enchantment}"
 
     @staticmethod
-    def fetch_prices(url: str) -> pd.DataFrame:
-        response = requests.get(url)
-        if response.status_code == 200:
-            df = pd.DataFrame(response.json())
-            if (
-                "sell_price_max_date"
-                or "buy_price_min_date"
-                or "buy_price_max_date" in df.columns
-            ):
-                df = df[df["sell_price_max_date"] != "0001-01-01T00:00:00"]
-                df = df[df["sell_price_min_date"] != "0001-01-01T00:00:00"]
-                df = df[df["buy_price_min_date"] != "0001-01-01T00:00:00"]
-                df = df[df["buy_price_max_date"] != "0001-01-01T00:00:00"]
+    def split_price_url(url: str) -> Optional[Tuple[str, List[str], str]]:
+        """
+        Split a prices URL into (base URL, item ids, query string).
+        Returns None for URLs the price cache can't key on.
+        """
+        parts = urlsplit(url)
+        path = unquote(parts.path)
+        if not path.endswith(".json"):
+            return None
+        base_path, _, items_param = path[: -len(".json")].rpartition("/")
+        params = parse_qs(parts.query)
+        if not items_param or "locations" not in params:
+            return None
+        base_url = urlunsplit((parts.scheme, parts.netloc, base_path + "/", "", ""))
+        return base_url, items_param.split(","), parts.query
+
+    @staticmethod
+    def for_regions(
+        fetch: Callable[[str], T], regions: Sequence[str] = SCAN_REGIONS
+    ) -> Dict[str, T]:
+        """
+        Call `fetch(region)` for every region at once, one thread each.
+        Regions have their own rate limiter and connection pool, so this
+        takes about as long as the slowest region.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, len(regions))) as executor:
+            return dict(
+                zip(regions, executor.map(get_metrics().profiled(fetch), regions))
+            )
+
+    @staticmethod
+    def _request(
+        url: str,
+        endpoint: str = "prices",
+        headers: Optional[Dict[str, str]] = None,
+        region: str = DEFAULT_REGION,
+    ) -> requests.Response:
+        """
+        GET `url` through the region's shared HTTP client, recording
+        latency, size, retries and status
+        """
+        metrics = get_metrics()
+        labels = {"endpoint": endpoint, "region": region}
+        start = time.perf_counter()
+        try:
+            response = get_http_client(region).get(url, headers=headers)
+        except requests.RequestException:
+            metrics.inc("albion_requests_total", status="error", **labels)
+            raise
+        metrics.observe("albion_request_seconds", time.perf_counter() - start, **labels)
+        metrics.observe("albion_response_bytes", len(response.content), **labels)
+        # urllib3 keeps the retries of a request in its Retry history
+        retries = getattr(getattr(response.raw, "retries", None), "history", ())
+        metrics.observe("albion_request_retries", len(retries), **labels)
+        metrics.inc("albion_requests_total", status=response.status_code, **labels)
+        return response
+
+    @staticmethod
+    def _decode(content: bytes) -> PriceColumns:
+        """decode_price_columns, recording parse time and rows"""
+        metrics = get_metrics()
+        with metrics.timer("albion_parse_seconds"):
+            columns = decode_price_columns(content)
+        metrics.inc("albion_rows_parsed_total", len(columns))
+        return columns
+
+    @staticmethod
+    def _fetch_columns(
+        url: str, region: str = DEFAULT_REGION
+    ) -> Tuple[Optional[int], Optional[PriceColumns], bool]:
+        """
+        Fetch and decode a prices URL once the region's rate limiter admits
+        it.
+        Returns (status code, columns, changed). The request is conditional
+        on the previous response to the same URL; when the API answers 304
+        or the body is byte-for-byte the same, the previously decoded
+        columns are returned with changed False. The status code is None if
+        no response could be had at all.
+        """
+        metrics = get_metrics()
+        conditional = get_conditional_cache(region)
+        previous = conditional.get(url)
+        BatchProcessor(region).check_rate_limits()
+        try:
+            response = DataFetcher._request(
+                url, headers=ConditionalCache.request_headers(previous), region=region
+            )
+        except requests.RequestException as e:
+            print(f"Request to {url} failed: {e}")
+            return None, None, False
+        if response.status_code == 304 and previous is not None:
+            metrics.inc("albion_conditional_total", result="not_modified")
+            return 200, previous.columns, False
+        if response.status_code != 200:
+            return response.status_code, None, False
+
+        digest = content_digest(response.content)
+        unchanged = previous is not None and previous.digest == digest
+        columns = (
+            previous.columns if unchanged else DataFetcher._decode(response.content)
+        )
+        conditional.put(
+            url,
+            ConditionalEntry(
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                digest,
+                columns,
+            ),
+        )
+        metrics.inc(
+            "albion_conditional_total", result="identical" if unchanged else "changed"
+        )
+        return 200, columns, not unchanged
+
+    @staticmethod
+    def _fetch_and_store(
+        url: str, region: str = DEFAULT_REGION
+    ) -> Tuple[Optional[int], Optional[PriceColumns]]:
+        """
+        Fetch a prices URL and put its rows in the price cache under
+        `region`. Responses that changed are handed to the region's price
+        history, which keeps only the rows that differ from the last ones
+        it wrote.
+        """
+        status_code, columns, changed = DataFetcher._fetch_columns(url, region)
+        if columns is not None:
+            if changed:
+                DataFetcher._record(columns, region)
+            get_price_cache().put(columns.rows(), region)
+        return status_code, columns
+
+    @staticmethod
+    def _record(columns: PriceColumns, region: str = DEFAULT_REGION):
+        """Append freshly fetched rows to the region's local price history"""
+        if HISTORY_ENABLED:
+            get_history_store(region).append_snapshot(columns)
+
+    @staticmethod
+    def _get_price_columns(
+        url: str, region: str = DEFAULT_REGION, max_age: Optional[float] = None
+    ) -> Tuple[Optional[int], Optional[PriceColumns]]:
+        """
+        Fetch the rows of a prices URL of `region` through the local price
+        cache. Only items without fresh cached rows are requested upstream;
+        cached rows older than `max_age` seconds don't count as fresh.
+        """
+        split_url = DataFetcher.split_price_url(url)
+        if split_url is None:
+            return DataFetcher._fetch_columns(url, region)[:2]
+
+        base_url, items, query = split_url
+        params = parse_qs(query)
+        locations = params["locations"][0].split(",")
+        qualities = [int(q) for q in params.get("qualities", ["1"])[0].split(",")]
+
+        cache = get_price_cache()
+        cached_rows, stale_items = cache.get(
+            items, locations, qualities, region, max_age
+        )
+        parts = [PriceColumns.from_rows(cached_rows)]
+        if stale_items:
+            status_code, fetched = DataFetcher._fetch_and_store(
+                f"{base_url}{','.join(stale_items)}.json?{query}", region
+            )
+            if fetched is None:
+                return status_code, None
+            parts.append(fetched)
+        return 200, PriceColumns.concat(parts)
+
+    @staticmethod
+    def fetch_raw_prices(
+        url: str, region: str = DEFAULT_REGION, max_age: Optional[float] = None
+    ) -> Optional[pd.DataFrame]:
+        """
+        Fetch prices through the cache without any date filtering, or None
+        if they could not be fetched
+        """
+        status_code, columns = DataFetcher._get_price_columns(url, region, max_age)
+        if status_code == 200:
+            return columns.to_frame()
+        print(f"Failed to fetch data from {url}. Status code: {status_code}")
+        return None
+
+    @staticmethod
+    def fetch_prices(url: str, region: str = DEFAULT_REGION) -> pd.DataFrame:
+        status_code, columns = DataFetcher._get_price_columns(url, region)
+        if status_code == 200:
+            df = columns.to_frame()
+            if not df.empty:
+                # Placeholder dates are decoded as NaT
+                df = df.dropna(subset=list(DATE_FIELDS))
             # Save the corrected DataFrame to a CSV file
             df.to_csv("corrected_data.csv", index=False)
             return df
-        print(f"Failed to fetch data from {url}. Status code: {response.status_code}")
+        print(f"Failed to fetch data from {url}. Status code: {status_code}")
         return pd.DataFrame()
 
     @staticmethod
-    def fetch_artifact_prices(url: str) -> pd.DataFrame:
+    def fetch_artifact_prices(
+        url: str, region: str = DEFAULT_REGION, max_age: Optional[float] = None
+    ) -> pd.DataFrame:
         """Fetch prices with lenient date filtering specifically for artifact foundry."""
-        response = requests.get(url)
-        if response.status_code == 200:
-            df = pd.DataFrame(response.json())
+        status_code, columns = DataFetcher._get_price_columns(url, region, max_age)
+        if status_code == 200:
+            df = columns.to_frame()
             if not df.empty:
                 # Only filter out rows where all dates are invalid
-                date_columns = [col for col in df.columns if col.endswith("_date")]
-                if date_columns:
-                    # Create a mask for valid rows (at least one valid date)
-                    valid_rows = pd.Series(False, index=df.index)
-                    for col in date_columns:
-                        valid_rows |= df[col] != "0001-01-01T00:00:00"
-                    df = df[valid_rows]
+                df = df[df[list(DATE_FIELDS)].notna().any(axis=1)]
             return df
-        print(f"Failed to fetch data from {url}. Status code: {response.status_code}")
+        print(f"Failed to fetch data from {url}. Status code: {status_code}")
         return pd.DataFrame()
 
     @staticmethod
-    def fetch_prices_for_black_market(url: str) -> Optional[pd.DataFrame]:
-        response = requests.get(url)
-        if response.status_code == 200:
-            df = pd.DataFrame(response.json())
-            if (
-                "sell_price_max_date"
-                or "buy_price_min_date"
-                or "buy_price_max_date" in df.columns
-            ):
-                df = df[df["sell_price_max_date"] != "0001-01-01T00:00:00"]
-                df = df[df["buy_price_min_date"] != "0001-01-01T00:00:00"]
-                df = df[df["buy_price_max_date"] != "0001-01-01T00:00:00"]
-                df = df[df["sell_price_min_date"] != "0001-01-01T00:00:00"]
+    def fetch_artifact_price_table(
+        items: List[str],
+        cities: List[str] = CITIES,
+        region: str = DEFAULT_REGION,
+        max_age: Optional[float] = None,
+    ) -> pd.DataFrame:
+        """
+        Artifact prices of a region for the Artifact Foundry indexed by
+        (city, item_id), fetched for all cities at once. "Average" rows
+        hold the mean prices across cities.
+        """
+        # Artifacts only come in normal quality
+        urls = BatchProcessor(region).create_batched_url(items, cities, qualities=[1])
+        parts = []
+        for url in urls:
+            df = DataFetcher.fetch_artifact_prices(url, region, max_age)
+            if not df.empty:
+                parts.append(df)
+        if not parts:
+            return pd.DataFrame()
+
+        df = pd.concat(parts).astype({"city": str, "item_id": str})
+        prices = df.set_index(["city", "item_id"])[["sell_price_min", "buy_price_max"]]
+        average = prices.groupby(level="item_id").mean()
+        prices = pd.concat([prices, pd.concat({"Average": average}, names=["city"])])
+        return prices.sort_index()
+
+    @staticmethod
+    def fetch_prices_for_black_market(
+        url: str, region: str = DEFAULT_REGION
+    ) -> Optional[pd.DataFrame]:
+        status_code, columns = DataFetcher._get_price_columns(url, region)
+        if status_code == 200:
+            df = columns.to_frame()
+            if not df.empty:
+                df = df.dropna(subset=list(DATE_FIELDS))
             return df
-        print(f"Failed to fetch data from {url}. Status code: {response.status_code}")
+        print(f"Failed to fetch data from {url}. Status code: {status_code}")
         return None
 
-    def fetch_bulk_prices(self, items: List[str]) -> pd.DataFrame:
-        """Fetch prices for multiple items in batches"""
-        all_data = []
+    def _fetch_batch(
+        self, items: List[str], max_age: Optional[float] = None
+    ) -> Tuple[Optional[int], Optional[PriceColumns]]:
+        """
+        Rows of a batch of items: those fresh in the price cache, and the
+        rest fetched in a single request, recorded and cached
+        """
+        cached_rows, stale_items = get_price_cache().get(
+            items, CITIES, QUALITIES, self.region, max_age
+        )
+        parts = [PriceColumns.from_rows(cached_rows)]
+        if stale_items:
+            # A subset of a batch always fits in one URL
+            (url,) = self.batch_processor.create_batched_url(stale_items, CITIES)
+            status_code, fetched = DataFetcher._fetch_and_store(url, self.region)
+            if fetched is None:
+                return status_code, None
+            parts.append(fetched)
+        return 200, PriceColumns.concat(parts)
+
+    def iter_bulk_prices(
+        self,
+        items: List[str],
+        max_workers: int = MAX_WORKERS,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        max_age: Optional[float] = None,
+    ) -> Iterator[Tuple[int, Optional[PriceColumns]]]:
+        """
+        Fetch prices of the fetcher's region for multiple items in batches,
+        yielding (batch index, columns) as soon as each batch is ready, or
+        (batch index, None) for a batch that could not be fetched.
+        Each batch is read from the price cache first, so only its items
+        without cached rows fetched in the last `max_age` seconds are
+        requested. At most twice `max_workers` batches are in flight or
+        waiting to be consumed, so memory stays bounded by the batch size
+        rather than the item count, however warm the cache.
+        `progress_callback(done, total)` is called as each batch finishes.
+        """
+        batches = self.batch_processor.batch_items(items, CITIES)
+        fetch_batch = get_metrics().profiled(self._fetch_batch)
+        max_workers = max(1, max_workers)
+        pending = iter(enumerate(batches))
 
-        try:
-            # Get batched URLs
-            urls = self.batch_processor.create_batched_url(items, CITIES)
-
-            # Process each URL
-            for idx, url in enumerate(urls):
-                self.batch_processor.check_rate_limits()
-
-                try:
-                    response = self.session.get(url)
-                    if response.status_code == 200:
-                        data = response.json()
-                        all_data.extend(data)
-                        self.batch_processor.request_timestamps.append(time.time())
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+
+            def submit_next():
+                for idx, batch in pending:
+                    future = executor.submit(fetch_batch, batch, max_age)
+                    futures[future] = idx
+                    return
+
+            for _ in range(2 * max_workers):
+                submit_next()
+
+            done = 0
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    idx = futures.pop(future)
+                    submit_next()
+                    done += 1
+                    if progress_callback:
+                        progress_callback(done, len(batches))
+                    try:
+                        status_code, columns = future.result()
+                    except Exception:
+                        logger.warning(
+                            "Error fetching batch %d of %d in %s",
+                            idx + 1,
+                            len(batches),
+                            self.region,
+                            exc_info=True,
+                        )
+                        yield idx, None
+                        continue
+                    if status_code == 200:
+                        yield idx, columns
                     else:
-                        st.warning(
-                            f"Batch {idx+1} failed with status code: {response.status_code}"
+                        logger.warning(
+                            "Batch %d of %d in %s failed with status code: %s",
+                            idx + 1,
+                            len(batches),
+                            self.region,
+                            status_code,
                         )
-                except Exception as e:
-                    st.warning(f"Error fetching batch {idx+1}: {str(e)}")
-                    continue
+                        yield idx, None
 
-            return pd.DataFrame(all_data) if all_data else pd.DataFrame()
-
-        except Exception as e:
-            st.error(f"Failed to fetch prices: {str(e)}")
-            return pd.DataFrame()
+    def fetch_bulk_prices(
+        self,
+        items: List[str],
+        max_workers: int = MAX_WORKERS,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        max_age: Optional[float] = None,
+    ) -> pd.DataFrame:
+        """
+        Fetch prices for multiple items in batches into one frame.
+        Batches are merged in batch order regardless of completion order;
+        failed batches are left out and counted in
+        `df.attrs["failed_batches"]`, so callers can tell the user.
+        """
+        try:
+            batches = sorted(
+                self.iter_bulk_prices(items, max_workers, progress_callback, max_age),
+                key=lambda batch: batch[0],
+            )
+            df = PriceColumns.concat([columns for _, columns in batches]).to_frame()
+            failed = sum(columns is None for _, columns in batches)
+            if failed:
+                logger.warning(
+                    "%d of %d batches in %s could not be fetched",
+                    failed,
+                    len(batches),
+                    self.region,
+                )
+        except Exception:
+            logger.exception("Failed to fetch prices in %s", self.region)
+            df, failed = pd.DataFrame(), 1
+        df.attrs["failed_batches"] = failed
+        return df
@@ -0,0 +1,76 @@
+import argparse
+import sys
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+# Add the project root directory to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from config.constants import (
+    CITIES,
+    DEFAULT_REGION,
+    HISTORY_URLS,
+    HISTORY_TIME_SCALE,
+    QUALITIES,
+    REGIONS,
+)
+from utils.data_fetcher import DataFetcher
+from utils.history_store import HistoryStore, get_history_store
+
+
+def ingest_history(
+    items: List[str],
+    locations: Sequence[str] = CITIES,
+    qualities: Sequence[int] = QUALITIES,
+    time_scale: int = HISTORY_TIME_SCALE,
+    base_url: Optional[str] = None,
+    store: Optional[HistoryStore] = None,
+    region: str = DEFAULT_REGION,
+) -> int:
+    """
+    Download /stats/history data points of a region for `items` into its
+    history store. Returns the number of data points written.
+    """
+    store = store or get_history_store(region)
+    fetcher = DataFetcher(region)
+    urls = fetcher.batch_processor.create_batched_url(
+        items,
+        list(locations),
+        base_url=base_url or HISTORY_URLS[region],
+        extra_params={"time-scale": str(time_scale)},
+        qualities=qualities,
+    )
+
+    written = 0
+    for url in urls:
+        fetcher.batch_processor.check_rate_limits()
+        response = DataFetcher._request(url, "history", region=region)
+        if response.status_code != 200:
+            print(
+                f"Failed to fetch data from {url}. Status code: {response.status_code}"
+            )
+            continue
+        written += store.append_history(response.json())
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest Albion price history")
+    parser.add_argument("items", nargs="+", help="Item ids to ingest")
+    parser.add_argument("--time-scale", type=int, default=HISTORY_TIME_SCALE)
+    parser.add_argument("--region", choices=list(REGIONS), default=DEFAULT_REGION)
+    parser.add_argument("--base-url", help="Defaults to the region's server")
+    parser.add_argument(
+        "--qualities", type=int, nargs="+", default=QUALITIES, choices=QUALITIES
+    )
+    args = parser.parse_args()
+
+    count = ingest_history(
+        args.items,
+        qualities=args.qualities,
+        time_scale=args.time_scale,
+        base_url=args.base_url,
+        region=args.region,
+    )
+    print(f"Ingested {count} data points")
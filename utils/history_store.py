@@ -0,0 +1,334 @@
+import json
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.constants import (
+    CITIES,
+    DEFAULT_REGION,
+    HISTORY_DIR,
+    HISTORY_RETENTION_DAYS,
+)
+from .price_parser import DATE_FIELDS, INT_FIELDS, PriceColumns
+
+PRICE_COLUMNS = [field for field in INT_FIELDS if field != "quality"]
+
+# Fixed-width records; a partition file is a flat array of them, so it can
+# be appended to blindly and read back column-wise with np.fromfile
+SNAPSHOT_DTYPE = np.dtype(
+    [("fetched_at", "<i8"), ("city", "<i2"), ("quality", "u1")]
+    + [(field, "<i8") for field in PRICE_COLUMNS]
+    + [(field, "<i8") for field in DATE_FIELDS]
+)
+HISTORY_DTYPE = np.dtype(
+    [
+        ("timestamp", "<i8"),
+        ("city", "<i2"),
+        ("quality", "u1"),
+        ("avg_price", "<i8"),
+        ("item_count", "<i8"),
+    ]
+)
+# Fields that tell whether a snapshot row changed since it was last written
+VALUE_FIELDS = PRICE_COLUMNS + list(DATE_FIELDS)
+KINDS = {
+    "snapshots": (SNAPSHOT_DTYPE, "fetched_at"),
+    "history": (HISTORY_DTYPE, "timestamp"),
+}
+
+
+def _day(epoch_seconds: int) -> str:
+    return datetime.fromtimestamp(epoch_seconds, timezone.utc).strftime("%Y-%m-%d")
+
+
+def _epoch(value) -> Optional[int]:
+    if value is None:
+        return None
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize("UTC")
+    return int(timestamp.timestamp())
+
+
+class HistoryStore:
+    """
+    Append-only local time series of prices, partitioned by day and item.
+
+    Two kinds of records are kept under `root`:
+    - snapshots/<day>/<item>.bin: price rows fetched from the API, each
+      written only when its prices or dates differ from the last row
+      written for the same city and quality
+    - history/<day>/<item>.bin: data points from the /stats/history endpoint
+    Times are stored as UTC epoch seconds, cities as codes into cities.json.
+    Snapshot days older than `retention_days` are deleted as new days start.
+    """
+
+    def __init__(
+        self, root: Path = HISTORY_DIR, retention_days: int = HISTORY_RETENTION_DAYS
+    ):
+        self.root = Path(root)
+        self.retention_days = retention_days
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._cities_path = self.root / "cities.json"
+        if self._cities_path.exists():
+            self.cities = json.loads(self._cities_path.read_text(encoding="utf-8"))
+        else:
+            self.cities = list(CITIES)
+        self._city_codes = {city: code for code, city in enumerate(self.cities)}
+        # item_id -> sorted (city, quality) keys and the value hash of the
+        # last row written for each
+        self._last: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._pruned_day: Optional[str] = None
+
+    def _city_code(self, city: str) -> int:
+        """Return the code of a city, registering it if it is new"""
+        code = self._city_codes.get(city)
+        if code is None:
+            code = self._city_codes[city] = len(self.cities)
+            self.cities.append(city)
+            self._cities_path.write_text(json.dumps(self.cities), encoding="utf-8")
+        return code
+
+    def _append(self, kind: str, day: str, item_id: str, records: np.ndarray):
+        partition = self.root / kind / day
+        partition.mkdir(parents=True, exist_ok=True)
+        with open(partition / f"{item_id}.bin", "ab") as f:
+            records.tofile(f)
+
+    def append_snapshot(
+        self, columns: PriceColumns, fetched_at: Optional[float] = None
+    ) -> int:
+        """
+        Record the decoded price rows that changed since they were last
+        written; returns the number of rows written
+        """
+        n = len(columns)
+        if n == 0:
+            return 0
+        fetched_at = int(time.time() if fetched_at is None else fetched_at)
+
+        records = np.zeros(n, SNAPSHOT_DTYPE)
+        records["fetched_at"] = fetched_at
+        records["quality"] = columns.ints["quality"][:n]
+        for field in PRICE_COLUMNS:
+            records[field] = columns.ints[field][:n]
+
+        dates = columns.parsed_dates()
+        epochs = np.where(
+            np.isnat(dates), 0, dates.astype("datetime64[s]").astype(np.int64)
+        )
+        for field in DATE_FIELDS:
+            records[field] = epochs[columns.codes[field][:n]]
+
+        item_names = list(columns.tables["item_id"])
+        item_codes = columns.codes["item_id"][:n]
+        written = 0
+        with self._lock:
+            day = _day(fetched_at)
+            if day != self._pruned_day:
+                self._prune(fetched_at)
+                self._pruned_day = day
+
+            city_remap = np.array(
+                [self._city_code(city) for city in columns.tables["city"]] + [-1],
+                dtype=np.int16,
+            )
+            records["city"] = city_remap[columns.codes["city"][:n]]
+            keys = records["city"].astype(np.int64) * 256 + records["quality"]
+            hashes = pd.util.hash_pandas_object(
+                pd.DataFrame(records[VALUE_FIELDS]), index=False
+            ).to_numpy()
+
+            # One append per item: sort once, then split on item boundaries
+            order = np.argsort(item_codes, kind="stable")
+            sorted_codes = item_codes[order]
+            boundaries = np.flatnonzero(np.diff(sorted_codes)) + 1
+            for group in np.split(order, boundaries):
+                code = item_codes[group[0]]
+                if code < 0:
+                    continue
+                item_id = item_names[code]
+                changed = self._changed(item_id, day, keys[group], hashes[group])
+                if changed.any():
+                    self._append("snapshots", day, item_id, records[group[changed]])
+                    written += int(changed.sum())
+        return written
+
+    def _changed(
+        self, item_id: str, day: str, keys: np.ndarray, hashes: np.ndarray
+    ) -> np.ndarray:
+        """
+        Mask of the rows of one item whose values differ from the last row
+        written for their key, remembering them as the last rows
+        """
+        last = self._last.get(item_id)
+        if last is None:
+            # First sight in this process: pick up today's rows, if any
+            last = self._latest_written(item_id, day)
+        changed = np.ones(len(keys), dtype=bool)
+        if last is not None:
+            last_keys, last_hashes = last
+            position = np.minimum(
+                np.searchsorted(last_keys, keys), max(len(last_keys) - 1, 0)
+            )
+            if len(last_keys):
+                changed = (last_keys[position] != keys) | (
+                    last_hashes[position] != hashes
+                )
+            # The newest rows win over the remembered ones
+            keys = np.concatenate([keys[::-1], last_keys])
+            hashes = np.concatenate([hashes[::-1], last_hashes])
+        else:
+            keys, hashes = keys[::-1], hashes[::-1]
+        keys, first = np.unique(keys, return_index=True)
+        self._last[item_id] = (keys, hashes[first])
+        return changed
+
+    def _latest_written(
+        self, item_id: str, day: str
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Keys and value hashes of the latest rows of an item written on `day`"""
+        path = self.root / "snapshots" / day / f"{item_id}.bin"
+        if not path.exists():
+            return None
+        records = np.fromfile(path, dtype=SNAPSHOT_DTYPE)[::-1]
+        keys = records["city"].astype(np.int64) * 256 + records["quality"]
+        hashes = pd.util.hash_pandas_object(
+            pd.DataFrame(records[VALUE_FIELDS]), index=False
+        ).to_numpy()
+        keys, first = np.unique(keys, return_index=True)
+        return keys, hashes[first]
+
+    def _prune(self, now: int):
+        """Delete the snapshot days that fell out of the retention window"""
+        if not self.retention_days:
+            return
+        oldest = _day(now - self.retention_days * 86400)
+        for day in self._days("snapshots", None, None):
+            if day < oldest:
+                shutil.rmtree(self.root / "snapshots" / day, ignore_errors=True)
+
+    def append_history(self, entries: Iterable[Dict]) -> int:
+        """
+        Record a /stats/history response, i.e. entries with location,
+        item_id, quality and a list of data points. Returns points written.
+        """
+        written = 0
+        with self._lock:
+            for entry in entries:
+                points = entry.get("data") or []
+                if not points:
+                    continue
+                records = np.zeros(len(points), HISTORY_DTYPE)
+                records["timestamp"] = [_epoch(point["timestamp"]) for point in points]
+                records["city"] = self._city_code(entry["location"])
+                records["quality"] = entry.get("quality", 1)
+                records["avg_price"] = [point.get("avg_price", 0) for point in points]
+                records["item_count"] = [point.get("item_count", 0) for point in points]
+
+                days = np.array([_day(ts) for ts in records["timestamp"]])
+                for day in np.unique(days):
+                    self._append("history", day, entry["item_id"], records[days == day])
+                written += len(points)
+        return written
+
+    def _days(self, kind: str, start: Optional[int], end: Optional[int]) -> List[str]:
+        kind_root = self.root / kind
+        if not kind_root.exists():
+            return []
+        first = _day(start) if start is not None else ""
+        last = _day(end) if end is not None else "9999-12-31"
+        return sorted(
+            path.name
+            for path in kind_root.iterdir()
+            if path.is_dir() and first <= path.name <= last
+        )
+
+    def query(
+        self,
+        item_id: str,
+        city: Optional[str] = None,
+        start=None,
+        end=None,
+        kind: str = "snapshots",
+        quality: Optional[int] = None,
+        resample: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """
+        Return the records of one item between `start` and `end` (anything
+        pd.Timestamp accepts, UTC when naive), optionally for one city and
+        quality. Snapshots only hold the rows that changed, so a price
+        holds until the next record of its city and quality. `resample` is
+        a pandas offset alias such as "1h" or "1D"; prices are then averaged
+        per city and quality, ignoring zeros.
+        """
+        dtype, time_field = KINDS[kind]
+        start, end = _epoch(start), _epoch(end)
+
+        parts = []
+        for day in self._days(kind, start, end):
+            path = self.root / kind / day / f"{item_id}.bin"
+            if path.exists():
+                parts.append(np.fromfile(path, dtype=dtype))
+        if not parts:
+            return pd.DataFrame()
+
+        records = np.concatenate(parts)
+        mask = np.ones(len(records), dtype=bool)
+        if start is not None:
+            mask &= records[time_field] >= start
+        if end is not None:
+            mask &= records[time_field] <= end
+        if city is not None:
+            mask &= records["city"] == self._city_codes.get(city, -2)
+        if quality is not None:
+            mask &= records["quality"] == quality
+        records = records[mask]
+
+        df = pd.DataFrame(records)
+        df[time_field] = pd.to_datetime(df[time_field], unit="s", utc=True)
+        city_names = np.array(self.cities + [None], dtype=object)
+        df["city"] = city_names[df["city"].to_numpy()]
+        for field in DATE_FIELDS if kind == "snapshots" else ():
+            df[field] = pd.to_datetime(
+                df[field].where(df[field] > 0), unit="s", utc=True
+            )
+        if kind == "history":
+            df = df.drop_duplicates([time_field, "city", "quality"])
+
+        if resample:
+            values = (
+                PRICE_COLUMNS if kind == "snapshots" else ["avg_price", "item_count"]
+            )
+            df[values] = df[values].where(df[values] > 0)
+            df = (
+                df.set_index(time_field)
+                .groupby(["city", "quality"])[values]
+                .resample(resample)
+                .mean()
+                .dropna(how="all")
+                .reset_index()
+            )
+        return df.sort_values(time_field).reset_index(drop=True)
+
+
+_shared_stores: Dict[str, HistoryStore] = {}
+_shared_store_lock = threading.Lock()
+
+
+def get_history_store(region: str = DEFAULT_REGION) -> HistoryStore:
+    """
+    Return the history store of a region, shared by the whole process.
+    Each region is kept in its own directory under HISTORY_DIR.
+    """
+    with _shared_store_lock:
+        if region not in _shared_stores:
+            _shared_stores[region] = HistoryStore(HISTORY_DIR / region)
+        return _shared_stores[region]
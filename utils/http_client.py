@@ -0,0 +1,81 @@
+import threading
+from typing import Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+from config.constants import (
+    DEFAULT_REGION,
+    HTTP_POOL_SIZE,
+    HTTP_RETRIES,
+    HTTP_RETRY_BACKOFF,
+    HTTP_RETRY_STATUSES,
+    HTTP_TIMEOUT,
+)
+
+
+def create_session(
+    pool_size: int = HTTP_POOL_SIZE, retries: int = HTTP_RETRIES
+) -> requests.Session:
+    """Create a requests session with a connection pool and retry strategy"""
+    session = requests.Session()
+    retry_strategy = Retry(
+        total=retries,
+        backoff_factor=HTTP_RETRY_BACKOFF,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        # Hand the last response back instead of raising, so callers can
+        # report its status code
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry_strategy,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate"})
+    return session
+
+
+class HttpClient:
+    """
+    HTTP client shared by every request to the Albion Data API.
+
+    Connections are kept alive in a pool sized to the number of requests in
+    flight at once, responses are compressed, failed requests are retried
+    with backoff (honouring Retry-After) and every request has a timeout.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = HTTP_POOL_SIZE,
+        timeout: Tuple[float, float] = HTTP_TIMEOUT,
+        retries: int = HTTP_RETRIES,
+    ):
+        self.timeout = timeout
+        self.session = create_session(pool_size, retries)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_shared_clients: Dict[str, HttpClient] = {}
+_shared_client_lock = threading.Lock()
+
+
+def get_http_client(region: str = DEFAULT_REGION) -> HttpClient:
+    """
+    Return the HTTP client of a region, shared by every fetch path in this
+    process. Each region has its own connection pool, so a slow server
+    can't hold the connections another region's requests are waiting for.
+    """
+    with _shared_client_lock:
+        if region not in _shared_clients:
+            _shared_clients[region] = HttpClient()
+        return _shared_clients[region]
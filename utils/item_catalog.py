@@ -0,0 +1,213 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Add the project root directory to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from config.constants import ITEMS_JSON_PATH, ITEM_CATALOG_PATH
+
+MAGIC = b"ALBCAT01"
+# magic, source size, source mtime (ns), item count, string count, blob size
+HEADER_FORMAT = "<8sQqIIQ"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+
+class ItemCatalog:
+    """
+    Memory-mapped, columnar view of config/items_cleaned.json.
+
+    The compiled file holds one interned UTF-8 string table and, per item,
+    uint32 references into it for the unique name, EN-US name and EN-US
+    description, plus the item's numeric Index. Strings are only decoded
+    when asked for.
+    """
+
+    def __init__(self, path: Path = ITEM_CATALOG_PATH):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic,
+            self.source_size,
+            self.source_mtime_ns,
+            n_items,
+            n_strings,
+            blob_size,
+        ) = struct.unpack_from(HEADER_FORMAT, self._buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not an item catalog")
+
+        offset = HEADER_SIZE
+        self._string_offsets = np.frombuffer(
+            self._buffer, dtype="<u4", count=n_strings + 1, offset=offset
+        )
+        offset += self._string_offsets.nbytes
+        columns = np.frombuffer(
+            self._buffer, dtype="<u4", count=n_items * 4, offset=offset
+        )
+        offset += columns.nbytes
+        self._id_refs = columns[:n_items]
+        self._name_refs = columns[n_items : 2 * n_items]
+        self._description_refs = columns[2 * n_items : 3 * n_items]
+        self.indices = columns[3 * n_items :]
+        self._blob_offset = offset
+        self._ids: Optional[List[str]] = None
+        self._positions: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def load(
+        cls, source: Path = ITEMS_JSON_PATH, path: Path = ITEM_CATALOG_PATH
+    ) -> "ItemCatalog":
+        """Open the compiled catalog, rebuilding it first if `source` changed"""
+        source, path = Path(source), Path(path)
+        if not source.exists():
+            if path.exists():
+                return cls(path)
+            raise FileNotFoundError(source)
+
+        stat = source.stat()
+        if path.exists():
+            catalog = cls(path)
+            if (catalog.source_size, catalog.source_mtime_ns) == (
+                stat.st_size,
+                stat.st_mtime_ns,
+            ):
+                return catalog
+            catalog.close()
+        cls.build(source, path)
+        return cls(path)
+
+    @staticmethod
+    def build(source: Path = ITEMS_JSON_PATH, path: Path = ITEM_CATALOG_PATH):
+        """Compile the items JSON into the binary catalog format"""
+        source, path = Path(source), Path(path)
+        stat = source.stat()
+        with open(source, "r", encoding="utf-8") as f:
+            items_data = json.load(f)
+
+        strings: Dict[str, int] = {}
+
+        def intern(value: str) -> int:
+            return strings.setdefault(value, len(strings))
+
+        n_items = len(items_data)
+        columns = np.zeros(n_items * 4, dtype="<u4")
+        for i, item in enumerate(items_data):
+            columns[i] = intern(item.get("UniqueName", ""))
+            columns[n_items + i] = intern(
+                item.get("LocalizedNames", {}).get("EN-US", "")
+            )
+            columns[2 * n_items + i] = intern(
+                item.get("LocalizedDescriptions", {}).get("EN-US", "")
+            )
+            columns[3 * n_items + i] = int(item.get("Index") or 0)
+
+        encoded = [value.encode("utf-8") for value in strings]
+        string_offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+        np.cumsum([len(value) for value in encoded], out=string_offsets[1:])
+        blob = b"".join(encoded)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A private temporary file per builder, so concurrent builds never
+        # write into the same file before it is renamed into place
+        fd, tmp_path = tempfile.mkstemp(
+            dir=path.parent, prefix=path.name + ".", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(
+                    struct.pack(
+                        HEADER_FORMAT,
+                        MAGIC,
+                        stat.st_size,
+                        stat.st_mtime_ns,
+                        n_items,
+                        len(encoded),
+                        len(blob),
+                    )
+                )
+                f.write(string_offsets.tobytes())
+                f.write(columns.tobytes())
+                f.write(blob)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def close(self):
+        self._string_offsets = self._id_refs = self._name_refs = None
+        self._description_refs = self.indices = None
+        self._buffer.close()
+
+    def __len__(self) -> int:
+        return len(self._id_refs)
+
+    def _string(self, ref: int) -> str:
+        start = self._blob_offset + int(self._string_offsets[ref])
+        end = self._blob_offset + int(self._string_offsets[ref + 1])
+        return self._buffer[start:end].decode("utf-8")
+
+    def unique_name(self, position: int) -> str:
+        return self._string(self._id_refs[position])
+
+    def name(self, position: int) -> str:
+        return self._string(self._name_refs[position])
+
+    def description(self, position: int) -> str:
+        return self._string(self._description_refs[position])
+
+    def item(self, position: int) -> Dict:
+        """Return the item at `position` in the same shape as the JSON entry"""
+        return {
+            "UniqueName": self.unique_name(position),
+            "Index": str(self.indices[position]),
+            "LocalizedNames": {"EN-US": self.name(position)},
+            "LocalizedDescriptions": {"EN-US": self.description(position)},
+        }
+
+    def ids(self) -> List[str]:
+        """All unique names, in catalog order"""
+        if self._ids is None:
+            self._ids = [self._string(ref) for ref in self._id_refs]
+        return self._ids
+
+    def names(self) -> List[str]:
+        """All EN-US names, in catalog order"""
+        return [self._string(ref) for ref in self._name_refs]
+
+    def position(self, unique_name: str) -> Optional[int]:
+        """Return the catalog position of an item id, if present"""
+        if self._positions is None:
+            self._positions = {item_id: i for i, item_id in enumerate(self.ids())}
+        return self._positions.get(unique_name)
+
+
+_shared_catalog: Optional[ItemCatalog] = None
+_shared_catalog_lock = threading.Lock()
+
+
+def get_item_catalog() -> ItemCatalog:
+    """Return the item catalog shared by the whole process"""
+    global _shared_catalog
+    with _shared_catalog_lock:
+        if _shared_catalog is None:
+            _shared_catalog = ItemCatalog.load()
+        return _shared_catalog
+
+
+if __name__ == "__main__":
+    ItemCatalog.build()
+    catalog = ItemCatalog()
+    print(f"Items: {len(catalog)}")
+    print(f"Catalog size: {ITEM_CATALOG_PATH.stat().st_size:,} bytes")
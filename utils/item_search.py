@@ -1,36 +1,198 @@
-import json
+import bisect
+import os
+import pickle
+import re
 import sys
+import threading
 from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
 
 # Add the project root directory to the Python path
 project_root = Path(__file__).parent.parent
 sys.path.append(str(project_root))
 
-def find_matches():
-    """Compare first item's EN-US name to a manually written term."""
-    # Load items_cleaned.json
-    items_file = project_root / 'config' / 'items_cleaned.json'
-    with open(items_file, 'r', encoding='utf-8') as f:
-        items_data = json.load(f)
-    
-    # Get the first item
-    first_item = items_data[0]
-    
-    # Store its EN-US name
-    en_us_name = first_item.get('localizedNames', {}).get('EN-US', '')
-    
-    # Manually write the term to compare against
-    search_term = "Hideout"  # Change this to whatever you want to compare
-    
-    print(f"\nFirst item's EN-US name: {en_us_name}")
-    print(f"Comparing with term: {search_term}")
-    
-    # Compare and return result
-    if search_term in en_us_name:
-        print(f"\nMATCH FOUND!")
-        print(f"UniqueName: {first_item.get('uniqueName', '')}")
-    else:
-        print("\nNO MATCH")
+from config.constants import (
+    ITEM_SEARCH_INDEX_PATH,
+    RESOURCE_TYPES,
+    TIERS,
+    ENCHANTMENTS,
+)
+from utils.item_catalog import ItemCatalog, get_item_catalog
+
+# Bump when the index layout changes so persisted indexes are rebuilt
+INDEX_VERSION = 1
+# Minimum share of the query's trigrams a fuzzy match must contain
+MIN_TRIGRAM_SCORE = 0.5
+# Trigram candidates re-ranked with substring and prefix checks
+RERANK_CANDIDATES = 50
+
+
+def normalize(text: str) -> str:
+    """Lower-case and turn id separators into spaces"""
+    return " ".join(re.split(r"[\s_@]+", text.lower())).strip()
+
+
+def trigrams(text: str) -> set:
+    """Trigrams of a normalized string, padded so short words still match"""
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def resource_item_ids() -> List[str]:
+    """Refined and raw resource ids, which items_cleaned.json leaves out"""
+    return [
+        f"T{tier}_{resource}"
+        if enchant == 0
+        else f"T{tier}_{resource}_LEVEL{enchant}@{enchant}"
+        for resource in RESOURCE_TYPES
+        for tier in TIERS
+        for enchant in ENCHANTMENTS
+    ]
+
+
+class ItemSearchIndex:
+    """
+    Trigram inverted index over EN-US item names and unique names.
+
+    Queries are matched case-insensitively against both. Exact and prefix
+    matches rank first, then substring matches, then fuzzy matches that
+    share enough trigrams with the query.
+    """
+
+    def __init__(self, item_ids: List[str], names: List[str], signature: tuple):
+        self.item_ids = item_ids
+        self.names = names
+        self.signature = signature
+        self.name_keys = [normalize(name) for name in names]
+        self.id_keys = [normalize(item_id) for item_id in item_ids]
+        self.texts = [
+            f"{name} {item_id}".strip()
+            for item_id, name in zip(self.id_keys, self.name_keys)
+        ]
+
+        postings: Dict[str, List[int]] = {}
+        for position, text in enumerate(self.texts):
+            for gram in trigrams(text):
+                postings.setdefault(gram, []).append(position)
+        self.postings = {
+            gram: np.asarray(positions, dtype=np.int32)
+            for gram, positions in postings.items()
+        }
+
+        # Sorted (key, position) pairs for prefix lookups on names and ids
+        self.prefixes = sorted(
+            [(name, i) for i, name in enumerate(self.name_keys) if name]
+            + [(item_id, i) for i, item_id in enumerate(self.id_keys)]
+        )
+
+    @classmethod
+    def build(cls, catalog: ItemCatalog) -> "ItemSearchIndex":
+        resources = resource_item_ids()
+        return cls(
+            catalog.ids() + resources,
+            catalog.names() + resources,
+            cls.signature_for(catalog),
+        )
+
+    @staticmethod
+    def signature_for(catalog: ItemCatalog) -> tuple:
+        return (INDEX_VERSION, catalog.source_size, catalog.source_mtime_ns)
+
+    @classmethod
+    def load(
+        cls, catalog: ItemCatalog, path: Path = ITEM_SEARCH_INDEX_PATH
+    ) -> "ItemSearchIndex":
+        """Load the persisted index, rebuilding it if the catalog changed"""
+        path = Path(path)
+        if path.exists():
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+            if state.get("signature") == cls.signature_for(catalog):
+                index = cls.__new__(cls)
+                index.__dict__.update(state)
+                return index
+
+        index = cls.build(catalog)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "wb") as f:
+            # Plain state dict, so the file doesn't depend on the module path
+            pickle.dump(index.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return index
+
+    def _prefix_matches(self, query: str, limit: int) -> List[int]:
+        start = bisect.bisect_left(self.prefixes, (query, -1))
+        matches = []
+        for key, position in self.prefixes[start:]:
+            if not key.startswith(query) or len(matches) >= limit:
+                break
+            matches.append(position)
+        return matches
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """Return up to `limit` best matches, best first"""
+        query = normalize(query)
+        if not query:
+            return []
+
+        scores: Dict[int, float] = {}
+        for position in self._prefix_matches(query, RERANK_CANDIDATES):
+            scores[position] = 2.0
+
+        grams = trigrams(query)
+        postings = [self.postings[gram] for gram in grams if gram in self.postings]
+        if postings:
+            counts = np.bincount(np.concatenate(postings), minlength=len(self.texts))
+            candidates = np.flatnonzero(counts >= MIN_TRIGRAM_SCORE * len(grams))
+            if len(candidates) > RERANK_CANDIDATES:
+                best = np.argpartition(counts[candidates], -RERANK_CANDIDATES)
+                candidates = candidates[best[-RERANK_CANDIDATES:]]
+            for position in candidates.tolist():
+                score = counts[position] / len(grams)
+                if query in self.texts[position]:
+                    score += 1.0
+                scores[position] = max(scores.get(position, 0.0), float(score))
+
+        for position in scores:
+            if query == self.name_keys[position] or query == self.id_keys[position]:
+                scores[position] = 3.0
+
+        ranked = sorted(
+            scores.items(), key=lambda kv: (-kv[1], len(self.texts[kv[0]]), kv[0])
+        )
+        return [
+            {
+                "item_id": self.item_ids[position],
+                "name": self.names[position],
+                "score": round(score, 3),
+            }
+            for position, score in ranked[:limit]
+        ]
+
+
+_shared_index: Optional[ItemSearchIndex] = None
+_shared_index_lock = threading.Lock()
+
+
+def get_search_index() -> ItemSearchIndex:
+    """Return the search index shared by the whole process"""
+    global _shared_index
+    with _shared_index_lock:
+        if _shared_index is None:
+            _shared_index = ItemSearchIndex.load(get_item_catalog())
+        return _shared_index
+
+
+def find_matches(query: str, limit: int = 10) -> List[Dict]:
+    """Search items by EN-US name or unique name, best matches first"""
+    return get_search_index().search(query, limit)
+
 
 if __name__ == "__main__":
-    find_matches() 
\ No newline at end of file
+    search_term = " ".join(sys.argv[1:]) or "Hideout"
+    print(f"Results for: {search_term}")
+    for match in find_matches(search_term):
+        print(f"{match['score']:>6} {match['item_id']:<40} {match['name']}")
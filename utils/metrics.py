@@ -0,0 +1,370 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypeVar, Union
+
+from config.constants import METRICS_PORT, METRICS_PROFILE_LINES
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = tuple(1024 * 4**i for i in range(9))  # 1 KiB to 64 MiB
+RETRY_BUCKETS = (0, 1, 2, 3, 4, 5)
+ITEM_BUCKETS = (1, 10, 25, 50, 100, 200, 400, 800)
+
+T = TypeVar("T")
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "albion_requests_total": ("counter", "Albion Data API requests by status", None),
+    "albion_request_seconds": (
+        "histogram",
+        "Latency of Albion Data API requests, retries included",
+        LATENCY_BUCKETS,
+    ),
+    "albion_response_bytes": (
+        "histogram",
+        "Size of Albion Data API response bodies",
+        SIZE_BUCKETS,
+    ),
+    "albion_request_retries": (
+        "histogram",
+        "Retries needed per Albion Data API request",
+        RETRY_BUCKETS,
+    ),
+    "albion_conditional_total": (
+        "counter",
+        "Prices responses by outcome: not_modified, identical or changed",
+        None,
+    ),
+    "albion_changed_items_total": (
+        "counter",
+        "Items whose price rows changed since the previous scan",
+        None,
+    ),
+    "albion_rate_limit_wait_seconds": (
+        "histogram",
+        "Time spent waiting for the rate limiter per request",
+        LATENCY_BUCKETS,
+    ),
+    "albion_batch_items": (
+        "histogram",
+        "Items per batched request URL",
+        ITEM_BUCKETS,
+    ),
+    "albion_parse_seconds": (
+        "histogram",
+        "Time spent decoding a prices response",
+        LATENCY_BUCKETS,
+    ),
+    "albion_rows_parsed_total": ("counter", "Price rows decoded from responses", None),
+    "albion_analysis_seconds": (
+        "histogram",
+        "Time spent analyzing one batch of a market scan",
+        LATENCY_BUCKETS,
+    ),
+    "albion_analysis_rows_total": (
+        "counter",
+        "Price rows analyzed by market scans",
+        None,
+    ),
+    "albion_scan_seconds": (
+        "histogram",
+        "Wall time of a full market scan, fetching included",
+        LATENCY_BUCKETS + (60, 120, 300),
+    ),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        # One count per bucket plus the +Inf bucket, not yet cumulative
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate of the q-quantile, interpolated within its bucket"""
+        if not self.count:
+            return float("nan")
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    # Past the last bound there is nothing to interpolate to
+                    return float(lower)
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return float(self.buckets[-1])
+
+
+def _label_key(labels: Dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in pairs
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms of the fetch and analysis hot paths, rendered
+    in the Prometheus text format.
+
+    Metrics are declared up front in `definitions`; each distinct set of
+    labels gets its own series. When `profiling` is on, `profile` captures
+    a cProfile report per scan, including the threads the scan starts
+    through `profiled`.
+    """
+
+    def __init__(self, definitions: Dict[str, tuple] = METRICS):
+        self.definitions = definitions
+        self.profiling = False
+        # name -> (finished at, report) of the latest profiled run
+        self.profiles: Dict[str, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        # Profilers of the block being profiled on each thread, if any
+        self._local = threading.local()
+        self._series: Dict[str, Dict[Labels, Union[Histogram, float]]] = {
+            name: {} for name in definitions
+        }
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Add `amount` to a counter"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series[name]
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        """Record one observation in a histogram"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.definitions[name][2])
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observe the wall time of the block in a histogram"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def profile(self, name: str):
+        """
+        Capture a cProfile report of the block under `name` when profiling
+        is on. The calling thread is profiled along with the threads the
+        block runs `profiled` targets on, whose stats are merged into the
+        same report. Where only one profiler can run at a time (Python
+        3.12+), that one profiler already sees every thread, and a block
+        starting while another is being profiled runs unprofiled.
+        """
+        if not self.profiling:
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            yield
+            return
+        profilers = [profiler]
+        self._local.profilers = profilers
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._local.profilers = None
+            report = io.StringIO()
+            stats = pstats.Stats(profiler, stream=report)
+            with self._lock:
+                others = profilers[1:]
+            if others:
+                stats.add(*others)
+            stats.sort_stats("cumulative").print_stats(METRICS_PROFILE_LINES)
+            with self._lock:
+                self.profiles[name] = (time.time(), report.getvalue())
+
+    def profiled(self, target: Callable[..., T]) -> Callable[..., T]:
+        """
+        Wrap `target` so that, when it runs on another thread, it is
+        profiled into the block being profiled on the calling thread, if
+        any. Threads must finish before that block ends to be included.
+        """
+        profilers = getattr(self._local, "profilers", None)
+        if profilers is None:
+            return target
+
+        @functools.wraps(target)
+        def run(*args, **kwargs):
+            if getattr(self._local, "profilers", None) is not None:
+                # Already profiled on this thread
+                return target(*args, **kwargs)
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                return target(*args, **kwargs)
+            self._local.profilers = profilers
+            try:
+                return target(*args, **kwargs)
+            finally:
+                profiler.disable()
+                self._local.profilers = None
+                with self._lock:
+                    profilers.append(profiler)
+
+        return run
+
+    def profile_reports(self) -> Dict[str, Tuple[float, str]]:
+        """Copy of the latest (finished at, report) captured per name"""
+        with self._lock:
+            return dict(self.profiles)
+
+    def summary(self) -> List[Dict]:
+        """Count, mean and estimated p50/p95 of every histogram series"""
+        rows = []
+        with self._lock:
+            for name, series in self._series.items():
+                for labels, value in series.items():
+                    row = {"metric": name, "labels": _format_labels(labels)}
+                    if isinstance(value, Histogram):
+                        row.update(
+                            count=value.count,
+                            total=value.sum,
+                            mean=value.sum / value.count if value.count else None,
+                            p50=value.quantile(0.5),
+                            p95=value.quantile(0.95),
+                        )
+                    else:
+                        row.update(count=None, total=value)
+                    rows.append(row)
+        return rows
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, _) in self.definitions.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(self._series[name].items()):
+                    if not isinstance(value, Histogram):
+                        lines.append(
+                            f"{name}{_format_labels(labels)} {_format_value(value)}"
+                        )
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(
+                        value.buckets + (float("inf"),), value.counts
+                    ):
+                        cumulative += count
+                        le = (("le", _format_value(float(bound))),)
+                        lines.append(
+                            f"{name}_bucket{_format_labels(labels, le)} {cumulative}"
+                        )
+                    lines.append(
+                        f"{name}_sum{_format_labels(labels)} {_format_value(value.sum)}"
+                    )
+                    lines.append(f"{name}_count{_format_labels(labels)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Union[str, Path]):
+        """Atomically replace `path` with the current metrics"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(self.render(), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def reset(self):
+        with self._lock:
+            for series in self._series.values():
+                series.clear()
+            self.profiles.clear()
+
+
+def serve_metrics(
+    registry: MetricsRegistry, port: int, host: str = "0.0.0.0"
+) -> ThreadingHTTPServer:
+    """Serve `registry` at /metrics on a daemon thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    ).start()
+    return server
+
+
+_shared_metrics: Optional[MetricsRegistry] = None
+_shared_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """
+    Return the registry shared by the whole process, serving it on
+    METRICS_PORT the first time if a port is configured
+    """
+    global _shared_metrics
+    with _shared_metrics_lock:
+        if _shared_metrics is None:
+            _shared_metrics = MetricsRegistry()
+            if METRICS_PORT:
+                try:
+                    serve_metrics(_shared_metrics, METRICS_PORT)
+                except OSError as e:
+                    # Another app process on this host already serves the port
+                    print(f"Metrics endpoint not started on port {METRICS_PORT}: {e}")
+        return _shared_metrics
@@ -0,0 +1,433 @@
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# Kept free of app imports so ALBION_API_HOST can still be set after
+# importing this module
+API_PREFIX = "/api/v2/stats/"
+ITEMS_JSON_PATH = (
+    Path(__file__).resolve().parent.parent / "config" / "items_cleaned.json"
+)
+# Limits documented for the public API: (requests, window in seconds)
+RATE_LIMITS = ((180, 60), (300, 300))
+MAX_URL_LENGTH = 4096
+PLACEHOLDER_DATE = "0001-01-01T00:00:00"
+# Tiered ids such as T4_ORE or T5_PLANKS_LEVEL1@1; raw resources are not
+# in the items JSON but are scanned for arbitrage
+TIERED_ITEM_ID = re.compile(r"T\d+_[A-Z0-9_]+(@\d+)?")
+# Share of synthetic orders that are missing, like in real scans
+MISSING_ORDER_RATE = 0.2
+# Seconds between changes of each synthetic row; rows change at staggered
+# times, so this sets the market churn
+UPDATE_INTERVAL = 48 * 3600
+
+
+class FixtureServer:
+    """
+    Local stand-in for the Albion Data API that replays recorded rows.
+
+    Serves /api/v2/stats/prices/{items}.json and
+    /api/v2/stats/history/{items}.json, returning the fixture rows that
+    match the requested items, locations and qualities. Set
+    ALBION_API_HOST to `url` (before importing the app) or pass
+    `url + "/api/v2/stats/<endpoint>/"` as a base URL to use it.
+    """
+
+    def __init__(
+        self,
+        prices: Optional[List[Dict]] = None,
+        history: Optional[List[Dict]] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.fixtures = {"prices": prices or [], "history": history or []}
+        self.host = host
+        self.port = port
+        self.requests: List[str] = []
+        self.statuses: Counter = Counter()
+        # Send ETags and answer If-None-Match with 304 Not Modified
+        self.etags = False
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @classmethod
+    def from_directory(cls, path: Path, **kwargs) -> "FixtureServer":
+        """Load prices.json and history.json recorded from the real API"""
+        fixtures = {}
+        for endpoint in ("prices", "history"):
+            file = Path(path) / f"{endpoint}.json"
+            if file.exists():
+                fixtures[endpoint] = json.loads(file.read_text(encoding="utf-8"))
+        return cls(**fixtures, **kwargs)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def respond(self, path: str) -> Optional[List[Dict]]:
+        """Return the rows for a request path, or None if it isn't an API path"""
+        parts = urlsplit(path)
+        request_path = unquote(parts.path)
+        if not request_path.startswith(API_PREFIX) or not request_path.endswith(
+            ".json"
+        ):
+            return None
+        endpoint, _, items_param = request_path[
+            len(API_PREFIX) : -len(".json")
+        ].partition("/")
+        if endpoint not in self.fixtures:
+            return None
+
+        params = parse_qs(parts.query)
+        items = set(items_param.split(","))
+        locations = (
+            set(params["locations"][0].split(",")) if "locations" in params else None
+        )
+        qualities = {int(q) for q in params.get("qualities", ["1"])[0].split(",")}
+        location_key = "city" if endpoint == "prices" else "location"
+        return [
+            row
+            for row in self.fixtures[endpoint]
+            if row.get("item_id") in items
+            and (locations is None or row.get(location_key) in locations)
+            and row.get("quality", 1) in qualities
+        ]
+
+    def admit(self, path: str) -> Optional[Tuple[int, Dict[str, str]]]:
+        """
+        Decide whether to serve a request before looking up its rows.
+        Returns None to serve it, or the (status, headers) to reject it with.
+        """
+        return None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep connections alive like the live API; every response
+            # carries a Content-Length. Headers and body are written
+            # separately, so Nagle's algorithm would stall each response
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server.requests.append(self.path)
+                rejection = server.admit(self.path)
+                if rejection is not None:
+                    status, headers = rejection
+                    server.statuses[status] += 1
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                rows = server.respond(self.path)
+                if rows is None:
+                    server.statuses[404] += 1
+                    self.send_error(404)
+                    return
+                body = json.dumps(rows).encode("utf-8")
+                etag = None
+                if server.etags:
+                    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+                    if self.headers.get("If-None-Match") == etag:
+                        server.statuses[304] += 1
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                server.statuses[200] += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                if etag:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self) -> str:
+        """Start serving on a background thread and return the host URL"""
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.url
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FixtureServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class RequestLog:
+    """Sliding-window request counter enforcing several (limit, window) pairs"""
+
+    def __init__(self, limits: Sequence[Tuple[int, float]] = RATE_LIMITS):
+        self.limits = limits
+        self._longest = max(window for _, window in limits)
+        self._times: List[float] = []
+        self._lock = threading.Lock()
+
+    def admit(self) -> float:
+        """
+        Record a request and return 0 if every window has room for it,
+        otherwise return the seconds until it would be admitted
+        """
+        now = time.monotonic()
+        with self._lock:
+            del self._times[: bisect_right(self._times, now - self._longest)]
+            wait = 0.0
+            for limit, window in self.limits:
+                recent = len(self._times) - bisect_right(self._times, now - window)
+                if recent >= limit:
+                    wait = max(wait, self._times[-limit] + window - now)
+            if wait <= 0:
+                self._times.append(now)
+            return wait
+
+
+def _format_date(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(timestamp))
+
+
+def synthetic_price_row(
+    item_id: str,
+    city: str,
+    quality: int,
+    known: bool = True,
+    seed: int = 0,
+    now: Optional[float] = None,
+    update_interval: float = UPDATE_INTERVAL,
+) -> Dict:
+    """
+    A plausible prices row for one item, city and quality as of `now`.
+    Each row changes once every `update_interval` seconds at its own
+    offset, and is dated when it last changed; between changes it is
+    identical. Rows depend only on the arguments and `seed`. Unknown items
+    get the all-zero row the live API returns.
+    """
+    row = {"item_id": item_id, "city": city, "quality": quality}
+    if not known:
+        for field in ("sell_price_min", "sell_price_max", "buy_price_min"):
+            row.update({field: 0, f"{field}_date": PLACEHOLDER_DATE})
+        row.update(buy_price_max=0, buy_price_max_date=PLACEHOLDER_DATE)
+        return row
+
+    # Base price from the tier and enchantment, varied per item
+    tier = re.match(r"T(\d+)_", item_id)
+    enchantment = re.search(r"@(\d+)$", item_id)
+    item_rng = random.Random(f"{seed}:{item_id}")
+    base = (
+        item_rng.uniform(0.5, 2.0)
+        * 40
+        * 2.5 ** (int(tier.group(1)) if tier else 4)
+        * 2 ** (int(enchantment.group(1)) if enchantment else 0)
+        * (1 + 0.3 * (quality - 1))
+    )
+
+    key = f"{seed}:{item_id}:{city}:{quality}"
+    offset = random.Random(key).uniform(0, update_interval)
+    now = time.time() if now is None else now
+    version = math.floor((now - offset) / update_interval)
+    changed_at = _format_date(offset + version * update_interval)
+    rng = random.Random(f"{key}:{version}")
+    if city == "Black Market":
+        # The Black Market only places buy orders
+        sell_min = sell_max = 0
+        buy_max = int(base * rng.uniform(0.7, 1.4))
+    else:
+        sell_min = int(base * rng.uniform(0.8, 1.25))
+        sell_max = int(sell_min * rng.uniform(1.0, 1.5))
+        buy_max = int(sell_min * rng.uniform(0.6, 1.0))
+        if rng.random() < MISSING_ORDER_RATE:
+            sell_min = sell_max = 0
+    buy_min = int(buy_max * rng.uniform(0.3, 1.0))
+    if rng.random() < MISSING_ORDER_RATE:
+        buy_min = buy_max = 0
+
+    for field, price in zip(
+        ("sell_price_min", "sell_price_max", "buy_price_min", "buy_price_max"),
+        (sell_min, sell_max, buy_min, buy_max),
+    ):
+        row[field] = price
+        row[f"{field}_date"] = changed_at if price else PLACEHOLDER_DATE
+    return row
+
+
+def load_item_ids(path: Path = ITEMS_JSON_PATH) -> Set[str]:
+    """Unique names of every item in the items JSON"""
+    with open(path, "r", encoding="utf-8") as f:
+        return {item["UniqueName"] for item in json.load(f) if item.get("UniqueName")}
+
+
+class MockAlbionServer(FixtureServer):
+    """
+    FixtureServer that stands in for the live API under load.
+
+    Prices requests for items without fixture rows are answered with
+    deterministic synthetic rows (see synthetic_price_row) for every item
+    in the items JSON and every tiered item id; each row changes once every
+    `update_interval` seconds. Like the live API it answers 429 with
+    Retry-After once RATE_LIMITS are exceeded, 414 for URLs longer than
+    `max_url_length`, and each response is delayed by `latency` plus up to
+    `jitter` seconds. With `etags`, responses carry an ETag and repeated
+    requests with a matching If-None-Match get 304 Not Modified.
+    """
+
+    def __init__(
+        self,
+        prices: Optional[List[Dict]] = None,
+        history: Optional[List[Dict]] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        item_ids: Optional[Iterable[str]] = None,
+        seed: int = 0,
+        rate_limits: Optional[Sequence[Tuple[int, float]]] = RATE_LIMITS,
+        max_url_length: Optional[int] = MAX_URL_LENGTH,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        update_interval: float = UPDATE_INTERVAL,
+        etags: bool = True,
+    ):
+        super().__init__(prices, history, host, port)
+        self.update_interval = update_interval
+        self.etags = etags
+        self.item_ids = set(load_item_ids() if item_ids is None else item_ids)
+        self.seed = seed
+        self.request_log = RequestLog(rate_limits) if rate_limits else None
+        self.max_url_length = max_url_length
+        self.latency = latency
+        self.jitter = jitter
+        self._jitter_rng = random.Random(seed)
+        self._jitter_lock = threading.Lock()
+
+    def admit(self, path: str) -> Optional[Tuple[int, Dict[str, str]]]:
+        delay = self.latency
+        if self.jitter:
+            with self._jitter_lock:
+                delay += self._jitter_rng.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if self.max_url_length and len(self.url) + len(path) > self.max_url_length:
+            return 414, {}
+        if self.request_log is not None:
+            wait = self.request_log.admit()
+            if wait > 0:
+                return 429, {"Retry-After": str(math.ceil(wait))}
+        return None
+
+    def respond(self, path: str) -> Optional[List[Dict]]:
+        rows = super().respond(path)
+        parts = urlsplit(path)
+        if rows is None or not unquote(parts.path).startswith(API_PREFIX + "prices/"):
+            return rows
+
+        # Fixture rows win; every other requested combination is synthesized
+        request_path = unquote(parts.path)
+        items = request_path[len(API_PREFIX + "prices/") : -len(".json")].split(",")
+        params = parse_qs(parts.query)
+        locations = params["locations"][0].split(",") if "locations" in params else []
+        qualities = [int(q) for q in params.get("qualities", ["1"])[0].split(",")]
+        served = {(row["item_id"], row["city"], row.get("quality", 1)) for row in rows}
+        now = time.time()
+        for item_id in dict.fromkeys(items):
+            known = item_id in self.item_ids or bool(TIERED_ITEM_ID.fullmatch(item_id))
+            for city in locations:
+                for quality in qualities:
+                    if (item_id, city, quality) not in served:
+                        rows.append(
+                            synthetic_price_row(
+                                item_id,
+                                city,
+                                quality,
+                                known,
+                                self.seed,
+                                now,
+                                self.update_interval,
+                            )
+                        )
+        return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local Albion Data API")
+    parser.add_argument(
+        "fixtures",
+        nargs="?",
+        help="Directory with prices.json / history.json to replay",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--replay-only",
+        action="store_true",
+        help="Serve only the fixtures: no synthetic rows, limits or latency",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Seconds")
+    parser.add_argument("--no-rate-limit", action="store_true", help="Never answer 429")
+    parser.add_argument("--max-url-length", type=int, default=MAX_URL_LENGTH)
+    parser.add_argument(
+        "--update-interval",
+        type=float,
+        default=UPDATE_INTERVAL,
+        help="Seconds between changes of each synthetic row",
+    )
+    parser.add_argument("--no-etags", action="store_true", help="Never answer 304")
+    args = parser.parse_args()
+
+    if args.replay_only:
+        if not args.fixtures:
+            parser.error("--replay-only needs a fixtures directory")
+        server = FixtureServer.from_directory(
+            args.fixtures, host=args.host, port=args.port
+        )
+    else:
+        options = dict(
+            host=args.host,
+            port=args.port,
+            seed=args.seed,
+            rate_limits=None if args.no_rate_limit else RATE_LIMITS,
+            max_url_length=args.max_url_length,
+            latency=args.latency,
+            jitter=args.jitter,
+            update_interval=args.update_interval,
+            etags=not args.no_etags,
+        )
+        server = (
+            MockAlbionServer.from_directory(args.fixtures, **options)
+            if args.fixtures
+            else MockAlbionServer(**options)
+        )
+    print(f"Serving the Albion Data API on {server.start()}")
+    print(f"Run the app with ALBION_API_HOST={server.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,219 @@
+import sqlite3
+import threading
+import time
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config.constants import (
+    DEFAULT_REGION,
+    PRICE_FIELDS,
+    PRICE_CACHE_PATH,
+    PRICE_CACHE_TTL,
+    PRICE_CACHE_TTLS,
+    PRICE_CACHE_MAX_ROWS,
+)
+
+# Bump when the table layout changes; older caches are dropped and rebuilt
+SCHEMA_VERSION = 3
+# Keep IN (...) clauses well below SQLite's host parameter limit
+QUERY_CHUNK_SIZE = 500
+# Share of max_rows freed beyond the excess when evicting, so a full cache
+# isn't counted and evicted again on every put
+EVICTION_HEADROOM = 0.1
+
+
+class PriceCache:
+    """
+    SQLite-backed cache of price rows keyed by (region, item_id, city,
+    quality), so every region's rows are kept side by side.
+
+    Each row expires after the TTL of its item, and readers that need newer
+    prices can ask for rows fetched within a `max_age` instead. Rows are
+    evicted least recently used first once the cache holds more than
+    `max_rows`. The row count is kept up to date from the rows each `put`
+    adds rather than counted on every write; it is counted again before
+    evicting, which also picks up rows written by other processes.
+    """
+
+    def __init__(
+        self,
+        path: Path = PRICE_CACHE_PATH,
+        default_ttl: int = PRICE_CACHE_TTL,
+        ttls: Optional[Dict[str, int]] = None,
+        max_rows: int = PRICE_CACHE_MAX_ROWS,
+    ):
+        self.path = Path(path)
+        self.default_ttl = default_ttl
+        self.ttls = PRICE_CACHE_TTLS if ttls is None else ttls
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=False, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                self._conn.execute("DROP TABLE IF EXISTS prices")
+            columns = ", ".join(PRICE_FIELDS)
+            self._conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS prices (
+                    region,
+                    {columns},
+                    fetched_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (region, item_id, city, quality)
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS prices_last_access ON prices (last_access)"
+            )
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._row_count = self._count()
+
+    def ttl_for(self, item_id: str) -> int:
+        """Return the TTL in seconds for an item"""
+        for pattern, ttl in self.ttls.items():
+            if fnmatch(item_id, pattern):
+                return ttl
+        return self.default_ttl
+
+    def get(
+        self,
+        items: Sequence[str],
+        cities: Sequence[str],
+        qualities: Sequence[int],
+        region: str = DEFAULT_REGION,
+        max_age: Optional[float] = None,
+    ) -> Tuple[List[tuple], List[str]]:
+        """
+        Look up cached rows of a region for every (item, city, quality)
+        combination. Returns the rows of fully fresh items, in PRICE_FIELDS order, and
+        the items that have at least one stale or missing row. With
+        `max_age`, rows fetched more than `max_age` seconds ago count as
+        stale even before they expire; 0 bypasses the cache.
+        """
+        now = time.time()
+        fetched_after = now - max_age if max_age is not None else 0.0
+        wanted = len(set(cities)) * len(set(qualities))
+        rows_by_item: Dict[str, List[tuple]] = {}
+        columns = ", ".join(PRICE_FIELDS)
+        city_marks = ",".join("?" * len(cities))
+        quality_marks = ",".join("?" * len(qualities))
+
+        with self._lock, self._conn:
+            for start in range(0, len(items), QUERY_CHUNK_SIZE):
+                chunk = list(items[start : start + QUERY_CHUNK_SIZE])
+                item_marks = ",".join("?" * len(chunk))
+                cursor = self._conn.execute(
+                    f"""
+                    SELECT {columns} FROM prices
+                    WHERE region = ?
+                    AND item_id IN ({item_marks})
+                    AND city IN ({city_marks})
+                    AND quality IN ({quality_marks})
+                    AND expires_at > ?
+                    AND fetched_at > ?
+                    """,
+                    [region, *chunk, *cities, *qualities, now, fetched_after],
+                )
+                for row in cursor:
+                    rows_by_item.setdefault(row[0], []).append(row)
+
+            fresh_items = [
+                item for item, rows in rows_by_item.items() if len(rows) >= wanted
+            ]
+            for start in range(0, len(fresh_items), QUERY_CHUNK_SIZE):
+                chunk = fresh_items[start : start + QUERY_CHUNK_SIZE]
+                self._conn.execute(
+                    f"UPDATE prices SET last_access = ? WHERE region = ? "
+                    f"AND item_id IN ({','.join('?' * len(chunk))})",
+                    [now, region, *chunk],
+                )
+
+        fresh = set(fresh_items)
+        rows = [row for item in fresh_items for row in rows_by_item[item]]
+        stale = [item for item in dict.fromkeys(items) if item not in fresh]
+        return rows, stale
+
+    def put(self, rows: Iterable[Sequence], region: str = DEFAULT_REGION):
+        """Store price rows of a region given in PRICE_FIELDS order"""
+        now = time.time()
+        ttl_cache: Dict[str, int] = {}
+        records = []
+        for row in rows:
+            item_id = row[0]
+            if item_id not in ttl_cache:
+                ttl_cache[item_id] = self.ttl_for(item_id)
+            records.append((region, *row, now, now + ttl_cache[item_id], now))
+        if not records:
+            return
+
+        marks = ",".join("?" * (len(PRICE_FIELDS) + 4))
+        item_ids = list(ttl_cache)
+        with self._lock, self._conn:
+            # Replaced rows don't add to the count; only the rows of the
+            # written items can change, so counting those is enough
+            before = self._count_items(item_ids, region)
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO prices VALUES ({marks})", records
+            )
+            self._row_count += self._count_items(item_ids, region) - before
+            if self._row_count > self.max_rows:
+                self._evict()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM prices").fetchone()[0]
+
+    def _count_items(self, item_ids: Sequence[str], region: str) -> int:
+        """Rows of `item_ids` in a region, counted on the primary key index"""
+        count = 0
+        for start in range(0, len(item_ids), QUERY_CHUNK_SIZE):
+            chunk = item_ids[start : start + QUERY_CHUNK_SIZE]
+            count += self._conn.execute(
+                f"SELECT COUNT(*) FROM prices WHERE region = ? "
+                f"AND item_id IN ({','.join('?' * len(chunk))})",
+                [region, *chunk],
+            ).fetchone()[0]
+        return count
+
+    def _evict(self):
+        self._row_count = self._count()
+        excess = self._row_count - self.max_rows
+        if excess > 0:
+            excess += int(self.max_rows * EVICTION_HEADROOM)
+            self._row_count -= self._conn.execute(
+                """
+                DELETE FROM prices WHERE rowid IN (
+                    SELECT rowid FROM prices ORDER BY last_access LIMIT ?
+                )
+                """,
+                (excess,),
+            ).rowcount
+
+    def clear(self):
+        """Drop every cached row"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM prices")
+            self._row_count = 0
+
+
+_shared_cache: Optional[PriceCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_price_cache() -> PriceCache:
+    """Return the price cache shared by every fetch path in this process"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = PriceCache()
+        return _shared_cache
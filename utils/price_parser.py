@@ -0,0 +1,194 @@
+import json
+from typing import Dict, Iterable, Iterator, List, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from config.constants import PRICE_FIELDS
+
+INT_FIELDS = (
+    "quality",
+    "sell_price_min",
+    "sell_price_max",
+    "buy_price_min",
+    "buy_price_max",
+)
+CATEGORY_FIELDS = ("item_id", "city")
+DATE_FIELDS = (
+    "sell_price_min_date",
+    "sell_price_max_date",
+    "buy_price_min_date",
+    "buy_price_max_date",
+)
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+# The API's placeholder for "no order seen"
+INVALID_DATE = "0001-01-01T00:00:00"
+INITIAL_CAPACITY = 1024
+
+
+class PriceColumns:
+    """
+    Typed column buffers for price rows.
+
+    Integer fields go straight into int64 arrays. Item ids, cities and
+    dates are interned and stored as int32 codes (-1 when missing), so
+    each distinct string is kept and parsed only once.
+    """
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        capacity = max(1, capacity)
+        self.size = 0
+        self.ints = {field: np.zeros(capacity, np.int64) for field in INT_FIELDS}
+        self.codes = {
+            field: np.full(capacity, -1, np.int32)
+            for field in CATEGORY_FIELDS + DATE_FIELDS
+        }
+        # All date columns share one table: they hold the same timestamps
+        dates: Dict[str, int] = {}
+        self.tables: Dict[str, Dict[str, int]] = {
+            field: {} for field in CATEGORY_FIELDS
+        }
+        self.tables.update({field: dates for field in DATE_FIELDS})
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _grow(self):
+        capacity = 2 * len(self.ints["quality"])
+        for field, array in self.ints.items():
+            grown = np.zeros(capacity, np.int64)
+            grown[: len(array)] = array
+            self.ints[field] = grown
+        for field, array in self.codes.items():
+            grown = np.full(capacity, -1, np.int32)
+            grown[: len(array)] = array
+            self.codes[field] = grown
+
+    def append_pairs(self, pairs: Iterable) -> None:
+        """Append one row given as (field, value) pairs; unknown fields are ignored"""
+        row = self.size
+        if row == len(self.ints["quality"]):
+            self._grow()
+        ints, codes, tables = self.ints, self.codes, self.tables
+        for field, value in pairs:
+            column = ints.get(field)
+            if column is not None:
+                column[row] = value or 0
+                continue
+            column = codes.get(field)
+            if column is not None and value is not None:
+                table = tables[field]
+                code = table.get(value)
+                if code is None:
+                    code = table[value] = len(table)
+                column[row] = code
+        self.size = row + 1
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence]) -> "PriceColumns":
+        """Build columns from rows in PRICE_FIELDS order"""
+        columns = cls(len(rows))
+        for row in rows:
+            columns.append_pairs(zip(PRICE_FIELDS, row))
+        return columns
+
+    @classmethod
+    def concat(cls, parts: List["PriceColumns"]) -> "PriceColumns":
+        """Merge several column sets, re-coding their string tables"""
+        parts = [part for part in parts if part is not None]
+        merged = cls(sum(len(part) for part in parts))
+        for part in parts:
+            start, end = merged.size, merged.size + len(part)
+            for field in INT_FIELDS:
+                merged.ints[field][start:end] = part.ints[field][: len(part)]
+            for field in CATEGORY_FIELDS + DATE_FIELDS:
+                table = merged.tables[field]
+                # Trailing -1 so missing values (code -1) stay missing
+                remap = np.array(
+                    [
+                        table.setdefault(value, len(table))
+                        for value in part.tables[field]
+                    ]
+                    + [-1],
+                    dtype=np.int32,
+                )
+                merged.codes[field][start:end] = remap[part.codes[field][: len(part)]]
+            merged.size = end
+        return merged
+
+    def rows(self) -> Iterator[tuple]:
+        """Yield rows in PRICE_FIELDS order with the original string values"""
+        values = {}
+        for field in PRICE_FIELDS:
+            if field in self.ints:
+                values[field] = self.ints[field][: self.size].tolist()
+            else:
+                strings = list(self.tables[field]) + [None]
+                values[field] = [
+                    strings[code] for code in self.codes[field][: self.size]
+                ]
+        return zip(*(values[field] for field in PRICE_FIELDS))
+
+    def parsed_dates(self) -> np.ndarray:
+        """
+        datetime64 value of every entry in the shared date table, followed
+        by NaT for missing dates (code -1). The placeholder date is NaT too.
+        """
+        date_strings = [
+            None if value == INVALID_DATE else value
+            for value in self.tables[DATE_FIELDS[0]]
+        ]
+        return np.append(
+            pd.to_datetime(
+                pd.Series(date_strings, dtype=object),
+                format=DATE_FORMAT,
+                errors="coerce",
+            ).to_numpy(dtype="datetime64[ns]"),
+            np.datetime64("NaT", "ns"),
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """Build a DataFrame without going through per-row dicts"""
+        if self.size == 0:
+            return pd.DataFrame()
+
+        # Every distinct date is parsed once
+        parsed_dates = self.parsed_dates()
+
+        data = {}
+        for field in PRICE_FIELDS:
+            if field in self.ints:
+                data[field] = self.ints[field][: self.size]
+            elif field in CATEGORY_FIELDS:
+                data[field] = pd.Categorical.from_codes(
+                    self.codes[field][: self.size],
+                    categories=list(self.tables[field]),
+                )
+            else:
+                data[field] = parsed_dates[self.codes[field][: self.size]]
+        return pd.DataFrame(data)
+
+
+def decode_price_columns(payload: Union[bytes, str]) -> PriceColumns:
+    """
+    Decode a prices endpoint response into typed columns.
+    Each JSON object is handed to the column buffers as soon as it is
+    parsed and then discarded, so no list of row dicts is ever built.
+    """
+    if isinstance(payload, bytes):
+        # Preallocate from the number of rows in the payload
+        capacity = payload.count(b'"item_id"')
+    else:
+        capacity = payload.count('"item_id"')
+    columns = PriceColumns(capacity)
+
+    def collect(pairs):
+        columns.append_pairs(pairs)
+
+    json.loads(payload, object_pairs_hook=collect)
+    return columns
+
+
+def decode_prices(payload: Union[bytes, str]) -> pd.DataFrame:
+    """Decode a prices endpoint response straight into a DataFrame"""
+    return decode_price_columns(payload).to_frame()
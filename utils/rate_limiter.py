@@ -0,0 +1,159 @@
+import asyncio
+import os
+import struct
+import threading
+import time
+from bisect import bisect_right
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, List
+
+from config.constants import (
+    DEFAULT_REGION,
+    RATE_LIMIT_PER_MINUTE,
+    RATE_LIMIT_PER_5_MINUTES,
+    RATE_LIMIT_STATE_FILE,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:  # POSIX
+    msvcrt = None
+
+
+# Send times of the requests still inside the longest window, oldest first
+_TIME_FORMAT = "<d"
+_TIME_SIZE = struct.calcsize(_TIME_FORMAT)
+
+
+class RateLimiter:
+    """
+    Dual sliding-window limiter for the Albion Data API.
+
+    A request is let through only while fewer than RATE_LIMIT_PER_MINUTE
+    requests were sent in the last 60 seconds and fewer than
+    RATE_LIMIT_PER_5_MINUTES in the last 300 seconds, so no window of
+    either length ever holds more than its limit. When `state_file` is
+    given the send times live in that file under an OS lock, so every
+    process on the host draws from the same budget.
+
+    This is a sliding log rather than an O(1) token bucket: a bucket that
+    starts full lets a burst and its refill through, about twice a limit
+    in one window. Each request costs O(n) in the requests kept for the
+    longest window, which is bounded by RATE_LIMIT_PER_5_MINUTES.
+    """
+
+    def __init__(
+        self,
+        per_minute: int = RATE_LIMIT_PER_MINUTE,
+        per_5_minutes: int = RATE_LIMIT_PER_5_MINUTES,
+        state_file: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.limits = ((per_minute, 60.0), (per_5_minutes, 300.0))
+        self.longest = max(window for _, window in self.limits)
+        self.state_file = state_file
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._times: List[float] = []
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            wait = self._take()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait, without blocking the event loop, until a request may be sent"""
+        loop = asyncio.get_running_loop()
+        while True:
+            if self.state_file:
+                # The file lock can be held by another process for a while
+                wait = await loop.run_in_executor(None, self._take)
+            else:
+                wait = self._take()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def _take(self) -> float:
+        """Record a request if both windows have room, or return seconds until they do"""
+        with self._lock:
+            if self.state_file and (fcntl or msvcrt):
+                try:
+                    with self._shared_state() as times:
+                        return self._take_from(times)
+                except OSError:
+                    # Unusable state file: keep limiting this process alone
+                    self.state_file = None
+            return self._take_from(self._times)
+
+    def _take_from(self, times: List[float]) -> float:
+        now = self.clock()
+        del times[: bisect_right(times, now - self.longest)]
+        wait = 0.0
+        for limit, window in self.limits:
+            recent = len(times) - bisect_right(times, now - window)
+            if recent >= limit:
+                # Room frees up once the oldest of the last `limit` requests
+                # leaves the window
+                wait = max(wait, times[-limit] + window - now)
+        if wait <= 0:
+            times.append(now)
+        return wait
+
+    @contextmanager
+    def _shared_state(self):
+        """Yield the send times stored in `state_file`, writing them back after"""
+        fd = os.open(self.state_file, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                # Lock a fixed leading byte range; the file length varies
+                msvcrt.locking(fd, msvcrt.LK_LOCK, _TIME_SIZE)
+            try:
+                raw = b""
+                while True:
+                    chunk = os.read(fd, 1 << 16)
+                    if not chunk:
+                        break
+                    raw += chunk
+                count = len(raw) // _TIME_SIZE
+                times = sorted(struct.unpack(f"<{count}d", raw[: count * _TIME_SIZE]))
+                yield times
+                data = struct.pack(f"<{len(times)}d", *times)
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.write(fd, data)
+                os.ftruncate(fd, len(data))
+            finally:
+                os.lseek(fd, 0, os.SEEK_SET)
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, _TIME_SIZE)
+        finally:
+            os.close(fd)
+
+
+_shared_limiters: Dict[str, RateLimiter] = {}
+_shared_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter(region: str = DEFAULT_REGION) -> RateLimiter:
+    """
+    Return the limiter of a region's server, shared by every fetch path in
+    this process. Each server enforces its own limits, so regions don't
+    share a budget.
+    """
+    with _shared_limiter_lock:
+        if region not in _shared_limiters:
+            _shared_limiters[region] = RateLimiter(
+                state_file=RATE_LIMIT_STATE_FILE.format(region=region)
+            )
+        return _shared_limiters[region]
@@ -0,0 +1,155 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import pandas as pd
+
+from config.constants import SHARED_CACHE_MAX_BYTES, SHARED_CACHE_TTL
+
+
+def estimate_size(value: Any) -> int:
+    """Rough in-memory size of a cached value in bytes"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(key) + estimate_size(item) for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class SharedCache:
+    """
+    In-memory cache of scan results and price frames shared by every
+    Streamlit session in the process.
+
+    Entries expire after their TTL and the least recently used ones are
+    evicted once the estimated total size exceeds `max_bytes`. Concurrent
+    misses on the same key are collapsed into a single computation.
+    """
+
+    def __init__(
+        self,
+        default_ttl: float = SHARED_CACHE_TTL,
+        max_bytes: int = SHARED_CACHE_MAX_BYTES,
+    ):
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> (value, expires_at, size), least recently used first
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (found, value); must be called with the lock held"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        value, expires_at, size = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.size -= size
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            found, value = self._lookup(key)
+            return value if found else default
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        size = estimate_size(value)
+        ttl = self.default_ttl if ttl is None else ttl
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[2]
+            self._entries[key] = (value, time.time() + ttl, size)
+            self.size += size
+            self._evict()
+
+    def _evict(self):
+        # Always keep the newest entry, even if it alone is over the cap
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self.size -= size
+
+    def get_or_compute(
+        self, key: Hashable, compute: Callable[[], Any], ttl: Optional[float] = None
+    ) -> Any:
+        """
+        Return the cached value for `key`, computing and caching it on a
+        miss. Sessions missing the same key at the same time wait for the
+        first one's computation instead of starting their own. A None result
+        is returned but not cached, so a failed computation is retried.
+        """
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            if value is not None:
+                self.put(key, value, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def invalidate(
+        self, key: Optional[Hashable] = None, prefix: Optional[tuple] = None
+    ):
+        """
+        Drop one key, every tuple key starting with `prefix`, or everything
+        when neither is given. Computations already running are unaffected.
+        """
+        with self._lock:
+            if key is not None:
+                keys = [key] if key in self._entries else []
+            elif prefix is not None:
+                keys = [
+                    k
+                    for k in self._entries
+                    if isinstance(k, tuple) and k[: len(prefix)] == prefix
+                ]
+            else:
+                keys = list(self._entries)
+            for k in keys:
+                self.size -= self._entries.pop(k)[2]
+
+
+_shared_cache: Optional[SharedCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache() -> SharedCache:
+    """Return the result cache shared by the whole process"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = SharedCache()
+        return _shared_cache